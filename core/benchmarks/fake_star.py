@@ -0,0 +1,85 @@
+import re
+import threading
+import time
+import zlib
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from core.benchmarks.generator import make_devices, make_project
+
+
+class FakeStarServer:
+    """Local stand-in for STAR which serves GetDevices_AVT and GetTestCaseResults2_AVT.
+
+    Every device gets its own generated project of the same scale, every
+    response is delayed by `latency` seconds before its headers are sent.
+    """
+
+    MODEL = re.compile(rb'<model>(.*?)</model>')
+
+    def __init__(self, device_models: list, rows=1000, binaries=3, categories=20, latency=0.0, port=0):
+        self.device_models = device_models
+        self.categories = categories
+        self.latency = latency
+        self.devices = make_devices(device_models)
+        self.get_project = lru_cache(maxsize=None)(
+            lambda device_model: make_project(rows, binaries, categories, seed=zlib.crc32(device_model.encode('utf-8'))))
+        self.server = ThreadingHTTPServer(('127.0.0.1', port), self.__get_handler())
+        self.server.daemon_threads = True
+        self.thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f'http://{host}:{port}/'
+
+    def start(self) -> 'FakeStarServer':
+        self.thread = threading.Thread(target=self.server.serve_forever, name='fake-star', daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self) -> 'FakeStarServer':
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def get_response(self, body: bytes):
+        if b'GetDevices_AVT' in body:
+            return self.devices
+        model = self.MODEL.search(body)
+        if b'GetTestCaseResults2_AVT' in body and model is not None:
+            return self.get_project(model.group(1).decode('utf-8').strip())
+        return None
+
+    def __get_handler(self):
+        fake_star = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                response = fake_star.get_response(body)
+                if fake_star.latency:
+                    time.sleep(fake_star.latency)
+
+                if response is None:
+                    self.send_response(500)
+                    self.send_header('Content-Length', '0')
+                    self.end_headers()
+                    return
+
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/xml; charset=utf-8')
+                self.send_header('Content-Length', str(len(response)))
+                self.end_headers()
+                self.wfile.write(response)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
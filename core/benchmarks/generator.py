@@ -0,0 +1,92 @@
+import random
+from datetime import datetime, timedelta
+from xml.sax.saxutils import escape
+
+
+# Columns of TestCaseResults2 before binaries, as they come from STAR
+COLUMNS = ('displayorder', 'TestDescription', 'TestCriteria', 'TestCaseName', 'CategoryName', 'Priority',
+           'usku_v2', 'usku_v3', 'mr_usku_v2', 'mr_usku_v3', 'tc911', 'CustomerComments', 'TPComment',
+           'MELDefectType', 'IsStep', 'mtp', 'PTN', 'sdf')
+
+RESULTS = ('Pass', 'Fail', 'NS', 'Block', 'NIS', 'NT', None)
+
+def get_binaries(count: int) -> list:
+    """Returns names of binaries, they are three characters long like in STAR"""
+
+    return [f'{chr(65 + i // 260 % 26)}{i // 26 % 10}{chr(65 + i % 26)}' for i in range(count)]
+
+def get_categories(count: int) -> list:
+    return [f'Category {i:03}' for i in range(count)]
+
+def make_project(rows=1000, binaries=3, categories=20, seed=0) -> bytes:
+    """Returns a GetTestCaseResults2_AVT response with a diffgram of `rows` test cases.
+
+    Every 13th row has no changes, so it's skipped by the parser like
+    unchanged rows of real projects.
+    """
+
+    rng = random.Random(seed)
+    binaries = get_binaries(binaries)
+    categories = get_categories(categories)
+
+    schema = ''.join(f'<xs:element name="{name}" type="xs:string" minOccurs="0"/>'
+                     for name in COLUMNS + tuple(binaries))
+    parts = [
+        '<?xml version="1.0" encoding="utf-8"?>'
+        '<soap:Envelope xmlns:soap="http://schemas.xmlsoap.org/soap/envelope/"><soap:Body>'
+        '<GetTestCaseResults2_AVTResponse xmlns="http://tempuri.org/"><GetTestCaseResults2_AVTResult>'
+        '<xs:schema id="NewDataSet" xmlns="" xmlns:xs="http://www.w3.org/2001/XMLSchema" '
+        'xmlns:msdata="urn:schemas-microsoft-com:xml-msdata"><xs:element name="NewDataSet"><xs:complexType>'
+        '<xs:choice><xs:element name="TestCaseResults2"><xs:complexType><xs:sequence>',
+        schema,
+        '</xs:sequence></xs:complexType></xs:element></xs:choice></xs:complexType></xs:element></xs:schema>'
+        '<diffgr:diffgram xmlns:msdata="urn:schemas-microsoft-com:xml-msdata" '
+        'xmlns:diffgr="urn:schemas-microsoft-com:xml-diffgram-v1"><NewDataSet xmlns="">',
+    ]
+
+    for row in range(rows):
+        test_case = {
+            'displayorder': str(row + 1),
+            'TestDescription': f'Description of the test case {row} ' + 'lorem ipsum ' * rng.randint(1, 20),
+            'TestCriteria': f'Criteria of the test case {row} ' + 'dolor sit amet ' * rng.randint(1, 10),
+            'TestCaseName': f'TC-{row:06}',
+            'CategoryName': rng.choice(categories),
+            'Priority': rng.choice(('P0', 'P1', 'P2', 'P3')),
+        }
+        for variant in ('usku_v2', 'usku_v3', 'mr_usku_v2', 'mr_usku_v3'):
+            if rng.random() < 0.5:
+                test_case[variant] = 'Y'
+        if rng.random() < 0.1:
+            test_case['tc911'] = 'Y'
+        if rng.random() < 0.3:
+            test_case['CustomerComments'] = f'Comment for carrier {row} & <details>'
+        if rng.random() < 0.2:
+            test_case['TPComment'] = f'TP comment {row}'
+        if rng.random() < 0.1:
+            test_case['MELDefectType'] = rng.choice(('SW', 'HW', 'Network'))
+        for binary in binaries:
+            result = rng.choice(RESULTS)
+            if result:
+                test_case[binary] = result
+
+        has_changes = ' diffgr:hasChanges="modified"' if row % 13 else ''
+        body = ''.join(f'<{name}>{escape(value)}</{name}>' for name, value in test_case.items())
+        parts.append(f'<TestCaseResults2 diffgr:id="TestCaseResults2{row + 1}" msdata:rowOrder="{row}"'
+                     f'{has_changes}>{body}</TestCaseResults2>')
+
+    parts.append('</NewDataSet></diffgr:diffgram></GetTestCaseResults2_AVTResult>'
+                 '</GetTestCaseResults2_AVTResponse></soap:Body></soap:Envelope>')
+    return ''.join(parts).encode('utf-8')
+
+def make_devices(device_models: list, updated_at=None) -> bytes:
+    """Returns a GetDevices_AVT response listing the devices"""
+
+    updated_at = updated_at or datetime(2024, 1, 1)
+    tables = ''.join(f'<Table><Name>{escape(device_model)}</Name>'
+                     f'<Last_x0020_Update>{(updated_at - timedelta(hours=i)).isoformat()}</Last_x0020_Update></Table>'
+                     for i, device_model in enumerate(device_models))
+    return ('<?xml version="1.0" encoding="utf-8"?>'
+            '<soap:Envelope xmlns:soap="http://schemas.xmlsoap.org/soap/envelope/"><soap:Body>'
+            '<GetDevices_AVTResponse xmlns="http://tempuri.org/"><GetDevices_AVTResult>'
+            f'<NewDataSet xmlns="">{tables}</NewDataSet>'
+            '</GetDevices_AVTResult></GetDevices_AVTResponse></soap:Body></soap:Envelope>').encode('utf-8')
@@ -0,0 +1,123 @@
+import platform
+import statistics
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from timeit import default_timer as timer
+from unittest import mock
+from django.test import Client
+from core.benchmarks.fake_star import FakeStarServer
+from core.benchmarks.generator import get_categories, make_project
+from core.utils.metadata import MetadataCache
+from core.utils.snapshot import parse_project, parse_xml
+from core.utils.star import Project, ProjectCache, Star
+from core.utils.store import SnapshotStore
+
+
+DEVICE_MODEL = 'BENCH-0'
+
+def measure(function, repeat: int) -> dict:
+    """Returns statistics of `repeat` runs of the function in seconds"""
+
+    times = []
+    for _ in range(repeat):
+        timer_start = timer()
+        function()
+        times.append(timer() - timer_start)
+    return {'min': min(times),
+            'median': statistics.median(times),
+            'mean': statistics.fmean(times),
+            'max': max(times),
+            'repeat': repeat}
+
+def get_fake_metadata(categories: int) -> dict:
+    """Returns metadata with the categories of generated projects only"""
+
+    categories = [{'id': category_id, 'title': title}
+                  for category_id, title in enumerate(get_categories(categories), start=1)]
+    return {'categories': categories,
+            'teams': [],
+            'titles_by_id': {str(category['id']): category['title'] for category in categories},
+            'category_titles': frozenset(category['title'] for category in categories)}
+
+@contextmanager
+def use_fake_star(server: FakeStarServer):
+    """Points Star to the fake server and keeps benchmarked projects out of the database.
+
+    Categories of generated projects replace the metadata from the database
+    while the server is used, otherwise projects are filtered down to no
+    test cases, and the database is left untouched.
+    """
+
+    star_url = Star.STAR_URL
+    store_config = dict(SnapshotStore.CONFIG)
+    metadata = get_fake_metadata(server.categories)
+    Star.STAR_URL = server.url
+    SnapshotStore.CONFIG.update(ENABLED=False, SERVE_STORED=False)
+    try:
+        with mock.patch.object(MetadataCache, 'get_metadata', staticmethod(lambda: metadata)):
+            yield
+    finally:
+        Star.STAR_URL = star_url
+        SnapshotStore.CONFIG.update(store_config)
+
+def run_benchmarks(rows=1000, binaries=3, categories=20, latency=0.0, repeat=5) -> dict:
+    """Runs every benchmark against a fake STAR and returns results ready to be saved as JSON"""
+
+    raw_project = make_project(rows, binaries, categories)
+    filters = {'Priority': 'P3'}
+    form = {'Priority': 'P3', 'Variant': 'None'}
+    client = Client(HTTP_HOST='127.0.0.1')
+    benchmarks = {}
+
+    def run(name, function):
+        try:
+            benchmarks[name] = measure(function, repeat)
+        except Exception as error:
+            benchmarks[name] = {'error': repr(error)}
+
+    with FakeStarServer([DEVICE_MODEL], rows, binaries, categories, latency) as server, use_fake_star(server):
+        run('parse_xml', lambda: parse_xml(raw_project))
+        run('parse_project', lambda: parse_project(DEVICE_MODEL, raw_project))
+        run('project_init_download', lambda: Project(DEVICE_MODEL, filters, fresh=True))
+        run('project_init_streaming', lambda: Project(DEVICE_MODEL, filters, streaming=True, fresh=True))
+        run('project_init_cached', lambda: Project(DEVICE_MODEL, filters))
+        run('view_get', lambda: check(client.get(f'/view/{DEVICE_MODEL}')))
+        run('view_post_fresh', lambda: check(client.post(f'/view/{DEVICE_MODEL}?fresh=1', form)))
+        run('view_post_cached', lambda: check(client.post(f'/view/{DEVICE_MODEL}', form)))
+        run('view_rows', lambda: check(client.get(f'/view/{DEVICE_MODEL}/rows', {**form, 'sort': 'Priority'})))
+        run('index', lambda: check(client.get('/')))
+        # Benchmarks of filtering and rendering mean nothing if no test case is shown
+        filtered_rows = len(Project(DEVICE_MODEL, filters).rows)
+
+    return {
+        'meta': {
+            'date': datetime.now(timezone.utc).isoformat(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'rows': rows,
+            'binaries': binaries,
+            'categories': categories,
+            'latency': latency,
+            'project_size': len(raw_project),
+            'filtered_rows': filtered_rows,
+            'cache_stats': ProjectCache.get_stats(),
+        },
+        'benchmarks': benchmarks,
+    }
+
+def check(response):
+    if response.status_code != 200:
+        raise RuntimeError(f'{response.request["PATH_INFO"]} has responded with {response.status_code}')
+    return response
+
+def compare_results(results: dict, baseline: dict, threshold: float) -> list:
+    """Returns (name, baseline median, median) of benchmarks slower than the baseline by `threshold` times"""
+
+    regressions = []
+    for name, result in results['benchmarks'].items():
+        base = baseline.get('benchmarks', {}).get(name)
+        if not base or 'median' not in base or 'median' not in result:
+            continue
+        if result['median'] > base['median'] * threshold:
+            regressions.append((name, base['median'], result['median']))
+    return regressions
@@ -0,0 +1,44 @@
+import json
+from django.core.management.base import BaseCommand, CommandError
+from core.benchmarks.runner import compare_results, run_benchmarks
+
+
+class Command(BaseCommand):
+    help = 'Benchmarks parsing and views against a local fake STAR with a synthetic project'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1000, help='Test cases in the project')
+        parser.add_argument('--binaries', type=int, default=3, help='Binary versions in the project')
+        parser.add_argument('--categories', type=int, default=20, help='Categories in the project')
+        parser.add_argument('--latency', type=float, default=0.0, help='Delay of every STAR response, s')
+        parser.add_argument('--repeat', type=int, default=5, help='Runs of every benchmark')
+        parser.add_argument('--output', help='JSON file to save results to')
+        parser.add_argument('--baseline', help='JSON file with results to compare with')
+        parser.add_argument('--threshold', type=float, default=1.2,
+                            help='Median slower than the baseline by this factor is a regression')
+
+    def handle(self, *args, **options):
+        results = run_benchmarks(options['rows'], options['binaries'], options['categories'],
+                                 options['latency'], options['repeat'])
+
+        self.stdout.write(f'{results["meta"]["filtered_rows"]} test cases are shown with the benchmarked filters')
+        for name, result in results['benchmarks'].items():
+            if 'error' in result:
+                self.stderr.write(f'{name}: {result["error"]}')
+            else:
+                self.stdout.write(f'{name}: median {result["median"] * 1000:.1f} ms, '
+                                  f'min {result["min"] * 1000:.1f} ms, max {result["max"] * 1000:.1f} ms')
+
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                json.dump(results, output, indent=2)
+            self.stdout.write(f'Results have been saved to {options["output"]}')
+
+        if options['baseline']:
+            with open(options['baseline']) as baseline:
+                regressions = compare_results(results, json.load(baseline), options['threshold'])
+            for name, base, median in regressions:
+                self.stderr.write(f'{name}: {base * 1000:.1f} ms -> {median * 1000:.1f} ms')
+            if regressions:
+                raise CommandError(f'{len(regressions)} benchmarks have regressed')
+            self.stdout.write(self.style.SUCCESS('No regressions against the baseline.'))
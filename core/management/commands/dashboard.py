@@ -0,0 +1,38 @@
+from timeit import default_timer as timer
+from django.core.management.base import BaseCommand
+from core.utils.dashboard import Dashboard
+
+
+class Command(BaseCommand):
+    help = 'Counts results and issues of every active device for the dashboard'
+
+    def add_arguments(self, parser):
+        parser.add_argument('device_models', nargs='*', help="Devices' models, all active devices if omitted")
+        parser.add_argument('--download-workers', type=int, help='Number of parallel downloads')
+        parser.add_argument('--parse-workers', type=int, help='Number of parsing processes')
+        parser.add_argument('--fresh', action='store_true', help='Ignore cached projects')
+
+    def handle(self, *args, **options):
+        timer_start = timer()
+        summaries = Dashboard.refresh(options['device_models'],
+                                      fresh=options['fresh'],
+                                      download_workers=options['download_workers'],
+                                      parse_workers=options['parse_workers'])
+
+        failed = 0
+        for device_model, device_summary in summaries:
+            elapsed_time = "{:.2f}".format(timer() - timer_start)
+            if device_summary.error:
+                failed += 1
+                self.stderr.write(f'{device_model}: failed after {elapsed_time} s: {device_summary.error}')
+                continue
+
+            results = ', '.join(f'{result} {count}' for result, count in device_summary.summary['results'].items())
+            issues = ', '.join(f'{issue} {count}' for issue, count in device_summary.summary['issues'].items())
+            self.stdout.write(f'{device_model} {device_summary.binary_version}: {device_summary.total_tc} test cases, '
+                              f'{results}; {issues or "no issues"} ({elapsed_time} s)')
+
+        progress = Dashboard.get_progress()
+        total_time = "{:.2f}".format(timer() - timer_start)
+        self.stdout.write(self.style.SUCCESS(f'{progress["done"]} devices have been counted in {total_time} seconds, '
+                                             f'{failed} failed.'))
@@ -0,0 +1,34 @@
+from timeit import default_timer as timer
+from django.core.management.base import BaseCommand
+from core.utils.star import Star, Project
+
+
+class Command(BaseCommand):
+    help = 'Downloads and parses projects of several devices in parallel'
+
+    def add_arguments(self, parser):
+        parser.add_argument('device_models', nargs='*', help="Devices' models, all projects if omitted")
+        parser.add_argument('--download-workers', type=int, help='Number of parallel downloads')
+        parser.add_argument('--parse-workers', type=int, help='Number of parsing processes')
+        parser.add_argument('--fresh', action='store_true', help='Ignore cached projects')
+
+    def handle(self, *args, **options):
+        device_models = options['device_models'] or [project['Name'] for project in Star.get_projects()]
+
+        timer_start = timer()
+        projects = Project.load_many(device_models,
+                                     filters={},
+                                     fresh=options['fresh'],
+                                     download_workers=options['download_workers'],
+                                     parse_workers=options['parse_workers'])
+
+        for device_model, project in projects:
+            elapsed_time = "{:.2f}".format(timer() - timer_start)
+            if isinstance(project, Exception):
+                self.stderr.write(f'{device_model}: failed after {elapsed_time} s: {project!r}')
+            else:
+                self.stdout.write(f'{device_model}: {project.snapshot.total_tc} test cases, '
+                                  f'binary {project.current_binary_version}, done in {elapsed_time} s')
+
+        total_time = "{:.2f}".format(timer() - timer_start)
+        self.stdout.write(self.style.SUCCESS(f'{len(device_models)} projects have been loaded in {total_time} seconds.'))
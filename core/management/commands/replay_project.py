@@ -0,0 +1,39 @@
+from statistics import median
+from timeit import default_timer as timer
+from django.core.management.base import BaseCommand, CommandError
+from core.utils.archive import RawArchive
+from core.utils.star import Project
+
+
+class Command(BaseCommand):
+    help = 'Parses a project from an archived STAR response, without STAR and cache'
+
+    def add_arguments(self, parser):
+        parser.add_argument('device_model', help="Device's model")
+        parser.add_argument('--digest', help='SHA-1 of the archived response, the newest one of the device if omitted')
+        parser.add_argument('--streaming', action='store_true', help='Parse by a streaming pass')
+        parser.add_argument('--repeat', type=int, default=1, help='Runs of the parse')
+
+    def handle(self, *args, **options):
+        device_model = options['device_model']
+        digest = options['digest']
+        if digest is None:
+            latest = RawArchive.get_latest(device_model)
+            if latest is None:
+                raise CommandError(f'No response of {device_model} has been archived')
+            digest = latest.digest
+
+        times = []
+        for _ in range(options['repeat']):
+            timer_start = timer()
+            try:
+                project = Project.replay(device_model, digest, streaming=options['streaming'])
+            except FileNotFoundError:
+                raise CommandError(f'The response {digest} is not in the archive')
+            times.append(timer() - timer_start)
+
+        timings = ', '.join(f'{stage} {seconds * 1000:.1f} ms' for stage, seconds in project.snapshot.timings.items())
+        self.stdout.write(f'{device_model} {digest}: {project.snapshot.total_tc} test cases, '
+                          f'binary {project.current_binary_version} ({timings})')
+        self.stdout.write(self.style.SUCCESS(f'Parsed {len(times)} times: median {median(times) * 1000:.1f} ms, '
+                                             f'min {min(times) * 1000:.1f} ms, max {max(times) * 1000:.1f} ms'))
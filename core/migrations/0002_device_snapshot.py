@@ -0,0 +1,64 @@
+# Generated by Django 5.0.14 on 2026-10-18 10:23
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DeviceSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('device_model', models.CharField(max_length=100, verbose_name="Device's model")),
+                ('list_of_binaries', models.JSONField(default=list)),
+                ('binary_version', models.CharField(max_length=10, verbose_name='Current binary version')),
+                ('etag', models.CharField(blank=True, max_length=40)),
+                ('last_update', models.DateTimeField(null=True, verbose_name='Updated in STAR')),
+                ('fetched_at', models.DateTimeField()),
+                ('total_tc', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'ordering': ['-fetched_at'],
+                'get_latest_by': 'fetched_at',
+                'indexes': [models.Index(fields=['device_model', '-fetched_at'], name='core_device_device__850d95_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='TestCaseResult',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('device_model', models.CharField(max_length=100)),
+                ('binary_version', models.CharField(max_length=10)),
+                ('row', models.PositiveIntegerField()),
+                ('display_order', models.CharField(max_length=20, null=True)),
+                ('test_description', models.TextField(null=True)),
+                ('test_criteria', models.TextField(null=True)),
+                ('test_case_name', models.CharField(max_length=250, null=True)),
+                ('category', models.CharField(max_length=250, null=True)),
+                ('priority', models.CharField(max_length=10, null=True)),
+                ('usku_v2', models.CharField(max_length=20, null=True)),
+                ('usku_v3', models.CharField(max_length=20, null=True)),
+                ('mr_usku_v2', models.CharField(max_length=20, null=True)),
+                ('mr_usku_v3', models.CharField(max_length=20, null=True)),
+                ('tc911', models.CharField(max_length=20, null=True)),
+                ('customer_comments', models.TextField(null=True)),
+                ('tp_comment', models.TextField(null=True)),
+                ('mel_defect_type', models.CharField(max_length=100, null=True)),
+                ('is_step', models.CharField(max_length=20, null=True)),
+                ('last_result', models.CharField(max_length=20, null=True)),
+                ('previous_result', models.CharField(max_length=20, null=True)),
+                ('issue', models.CharField(max_length=50, null=True)),
+                ('snapshot', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='test_cases', to='core.devicesnapshot')),
+            ],
+            options={
+                'ordering': ['snapshot', 'row'],
+                'indexes': [models.Index(fields=['device_model', 'binary_version', 'category', 'priority'], name='core_testca_device__815802_idx'), models.Index(fields=['device_model', 'test_case_name'], name='core_testca_device__66ebad_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.0.14 on 2026-10-18 10:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_device_snapshot'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DeviceSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('device_model', models.CharField(max_length=100, unique=True, verbose_name="Device's model")),
+                ('binary_version', models.CharField(blank=True, max_length=10, verbose_name='Current binary version')),
+                ('total_tc', models.PositiveIntegerField(default=0)),
+                ('summary', models.JSONField(default=dict)),
+                ('error', models.TextField(blank=True)),
+                ('computed_at', models.DateTimeField()),
+            ],
+            options={
+                'verbose_name_plural': 'Device summaries',
+                'ordering': ['device_model'],
+            },
+        ),
+    ]
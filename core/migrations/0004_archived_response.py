@@ -0,0 +1,29 @@
+# Generated by Django 5.0.14 on 2026-10-18 10:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_device_summary'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedResponse',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('device_model', models.CharField(max_length=100, verbose_name="Device's model")),
+                ('digest', models.CharField(max_length=40, verbose_name='SHA-1 of the response')),
+                ('size', models.PositiveBigIntegerField(default=0)),
+                ('compressed_size', models.PositiveBigIntegerField(default=0)),
+                ('fetched_at', models.DateTimeField()),
+            ],
+            options={
+                'ordering': ['-fetched_at'],
+                'get_latest_by': 'fetched_at',
+                'indexes': [models.Index(fields=['device_model', '-fetched_at'], name='core_archiv_device__ef5024_idx'), models.Index(fields=['digest'], name='core_archiv_digest_d66992_idx')],
+            },
+        ),
+    ]
@@ -21,3 +21,87 @@ class Team(models.Model):
     
     class Meta:
         verbose_name_plural = "Teams"
+
+class DeviceSnapshot(models.Model):
+    device_model = models.CharField(max_length=100, verbose_name="Device's model")
+    list_of_binaries = models.JSONField(default=list)
+    binary_version = models.CharField(max_length=10, verbose_name="Current binary version")
+    etag = models.CharField(max_length=40, blank=True)
+    last_update = models.DateTimeField(null=True, verbose_name="Updated in STAR")
+    fetched_at = models.DateTimeField()
+    total_tc = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f'{self.device_model} {self.binary_version} ({self.fetched_at:%Y-%m-%d %H:%M})'
+
+    class Meta:
+        ordering = ['-fetched_at']
+        get_latest_by = 'fetched_at'
+        indexes = [models.Index(fields=['device_model', '-fetched_at'])]
+
+class TestCaseResult(models.Model):
+    snapshot = models.ForeignKey(DeviceSnapshot, on_delete=models.CASCADE, related_name='test_cases')
+    device_model = models.CharField(max_length=100)
+    binary_version = models.CharField(max_length=10)
+    row = models.PositiveIntegerField()
+    display_order = models.CharField(max_length=20, null=True)
+    test_description = models.TextField(null=True)
+    test_criteria = models.TextField(null=True)
+    test_case_name = models.CharField(max_length=250, null=True)
+    category = models.CharField(max_length=250, null=True)
+    priority = models.CharField(max_length=10, null=True)
+    usku_v2 = models.CharField(max_length=20, null=True)
+    usku_v3 = models.CharField(max_length=20, null=True)
+    mr_usku_v2 = models.CharField(max_length=20, null=True)
+    mr_usku_v3 = models.CharField(max_length=20, null=True)
+    tc911 = models.CharField(max_length=20, null=True)
+    customer_comments = models.TextField(null=True)
+    tp_comment = models.TextField(null=True)
+    mel_defect_type = models.CharField(max_length=100, null=True)
+    is_step = models.CharField(max_length=20, null=True)
+    last_result = models.CharField(max_length=20, null=True)
+    previous_result = models.CharField(max_length=20, null=True)
+    issue = models.CharField(max_length=50, null=True)
+
+    def __str__(self):
+        return f'{self.device_model} {self.binary_version} {self.test_case_name}'
+
+    class Meta:
+        ordering = ['snapshot', 'row']
+        indexes = [
+            models.Index(fields=['device_model', 'binary_version', 'category', 'priority']),
+            models.Index(fields=['device_model', 'test_case_name']),
+        ]
+
+class DeviceSummary(models.Model):
+    device_model = models.CharField(max_length=100, unique=True, verbose_name="Device's model")
+    binary_version = models.CharField(max_length=10, blank=True, verbose_name="Current binary version")
+    total_tc = models.PositiveIntegerField(default=0)
+    summary = models.JSONField(default=dict)
+    error = models.TextField(blank=True)
+    computed_at = models.DateTimeField()
+
+    def __str__(self):
+        return f'{self.device_model} {self.binary_version}'
+
+    class Meta:
+        ordering = ['device_model']
+        verbose_name_plural = "Device summaries"
+
+class ArchivedResponse(models.Model):
+    device_model = models.CharField(max_length=100, verbose_name="Device's model")
+    digest = models.CharField(max_length=40, verbose_name="SHA-1 of the response")
+    size = models.PositiveBigIntegerField(default=0)
+    compressed_size = models.PositiveBigIntegerField(default=0)
+    fetched_at = models.DateTimeField()
+
+    def __str__(self):
+        return f'{self.device_model} {self.digest[:12]} ({self.fetched_at:%Y-%m-%d %H:%M})'
+
+    class Meta:
+        ordering = ['-fetched_at']
+        get_latest_by = 'fetched_at'
+        indexes = [
+            models.Index(fields=['device_model', '-fetched_at']),
+            models.Index(fields=['digest']),
+        ]
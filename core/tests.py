@@ -1,3 +1,924 @@
+import asyncio
+import base64
+import gzip
+import io
+import os
+import re
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from itertools import product
+from unittest import mock
+from django.core.management import call_command
 from django.test import TestCase
+from django.urls import reverse
+from core.benchmarks.fake_star import FakeStarServer
+from core.benchmarks.generator import get_categories, make_project
+from core.benchmarks.runner import use_fake_star
+from core.models import ArchivedResponse, Category, DeviceSnapshot, Team
+from core.utils.archive import RawArchive
+from core.utils.export import ROWS_BATCH_SIZE, iter_rows
+from core.utils.listing import ProjectIndex
+from core.utils.live import LiveUpdates
+from core.utils.metadata import MetadataCache
+from core.utils.prefetch import PrefetchScheduler
+from core.utils.regressions import ResultMatrix
+from core.utils.search import SEARCH_COLUMNS, TestCaseIndex, get_words
+from core.utils.snapshot import (DIFF_COLUMNS, NECESSARY_TC_ITEMS, PRIORITY_LEVELS, VARIANTS, filter_rows,
+                                 parse_project, parse_xml, sort_rows)
+from core.utils.spill import SPILLED_COLUMNS, SpillDirectory, SpilledColumn, get_connection
+from core.utils.star import PACKED_PAYLOAD_SCAN, Project, ProjectCache, is_packed_payload, unpack_payload
+from core.utils.store import TEST_CASE_RESULT_FIELDS, SnapshotStore
 
-# Create your tests here.
+NAMESPACES = {'xs': 'http://www.w3.org/2001/XMLSchema', 'diffgr': 'urn:schemas-microsoft-com:xml-diffgram-v1'}
+
+
+class FakeStarTestCase(TestCase):
+    """Serves generated projects of DEVICE_MODELS from a local fake STAR"""
+
+    DEVICE_MODELS = ['DEV1', 'DEV2']
+    ROWS = 200
+    BINARIES = 4
+    CATEGORIES = 5
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = cls.enterClassContext(FakeStarServer(cls.DEVICE_MODELS, cls.ROWS, cls.BINARIES, cls.CATEGORIES))
+        cls.enterClassContext(use_fake_star(cls.server))
+
+    def setUp(self):
+        # Projects of the same devices may have been cached by other test classes
+        ProjectCache.clear()
+        self.addCleanup(ProjectCache.clear)
+
+
+class UseFakeStarTest(FakeStarTestCase):
+
+    def test_categories_of_generated_projects_are_not_stored(self):
+        self.assertEqual(MetadataCache.get_category_titles(), frozenset(get_categories(self.CATEGORIES)))
+        self.assertFalse(Category.objects.exists())
+        # Only filters of the project hide test cases, categories don't
+        project = Project('DEV1', {'tc911': 'on'})
+        self.assertEqual(len(project.rows), project.snapshot.total_tc)
+
+
+class MetadataCacheTest(TestCase):
+
+    def setUp(self):
+        MetadataCache.invalidate()
+        self.addCleanup(MetadataCache.invalidate)
+
+    def test_metadata_is_loaded_once(self):
+        Category.objects.create(title='Camera')
+        MetadataCache.get_metadata()
+
+        with self.assertNumQueries(0):
+            self.assertEqual(MetadataCache.get_category_titles(), frozenset(['Camera']))
+
+    def test_changed_categories_are_seen_at_once(self):
+        camera = Category.objects.create(title='Camera')
+        self.assertEqual(MetadataCache.get_category_titles(), frozenset(['Camera']))
+
+        audio = Category.objects.create(title='Audio')
+        self.assertEqual(MetadataCache.get_category_titles(), frozenset(['Audio', 'Camera']))
+        self.assertEqual(MetadataCache.get_category_titles([audio.id]), frozenset(['Audio']))
+
+        camera.is_active = False
+        camera.save()
+        self.assertEqual(MetadataCache.get_category_titles(), frozenset(['Audio']))
+
+        audio.delete()
+        self.assertEqual(MetadataCache.get_category_titles(), frozenset())
+
+    def test_changed_teams_are_seen_at_once(self):
+        camera = Category.objects.create(title='Camera')
+        team = Team.objects.create(name='Multimedia')
+        self.assertEqual(MetadataCache.get_teams()[0]['team_categories'], [])
+
+        team.categories.add(camera)
+        self.assertEqual(MetadataCache.get_teams()[0]['team_categories'], [{'id': camera.id, 'title': 'Camera'}])
+
+        team.delete()
+        self.assertEqual(MetadataCache.get_teams(), [])
+
+
+class WindowParamsTest(TestCase):
+
+    def test_not_integer_offset_is_bad_request(self):
+        response = self.client.get(reverse('view_rows', args=['DEV1']), {'offset': 'abc'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_not_integer_limit_is_bad_request(self):
+        response = self.client.get(reverse('search_test_cases'), {'limit': '1e3'})
+        self.assertEqual(response.status_code, 400)
+
+        response = self.client.get(reverse('search_projects'), {'limit': 'all'})
+        self.assertEqual(response.status_code, 400)
+
+
+class ViewPageTest(FakeStarTestCase):
+
+    def test_refresh_script_has_filter_fields_without_table(self):
+        # No category is selected by an unknown id, so the table isn't rendered
+        response = self.client.post(reverse('view', args=['DEV1']), {'category': '0'})
+        content = response.content.decode('utf-8')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('const rowsUrl', content)
+        self.assertIn('function reloadP', content)
+        self.assertLess(content.index('const filterFields'), content.index('function reloadP'))
+
+
+class AsyncLoadTest(TestCase):
+
+    def setUp(self):
+        ProjectCache.clear()
+        self.addCleanup(ProjectCache.clear)
+        self.enterContext(mock.patch.object(SnapshotStore, 'run_in_background',
+                                            staticmethod(lambda function, *args: function(*args))))
+        ProjectCache.set_snapshot('DEV1', parse_project('DEV1', make_project(100, 3, 5)))
+
+    async def test_aload_reads_categories_in_request_connection(self):
+        # The category exists only in the transaction of the test, which other connections don't see
+        category = await Category.objects.acreate(title='Category 001')
+
+        project = await Project.aload('DEV1', {'categories': [category.id], 'tc911': 'on'})
+        self.assertTrue(project.rows)
+        self.assertEqual({tc.CategoryName for tc in project.sorted_list_of_tc_by_category}, {'Category 001'})
+
+
+class PrefetchSchedulerTest(TestCase):
+
+    def setUp(self):
+        self.scheduler = PrefetchScheduler()
+        self.scheduler.CONFIG = {**PrefetchScheduler.CONFIG, 'ENABLED': True, 'INTERVAL': 0.02, 'KEEP_WARM_FOR': 0.3,
+                                 'REFRESH_BEFORE': 0, 'JITTER': 0, 'MAX_WORKERS': 1}
+        self.load_snapshot = self.enterContext(mock.patch.object(Project, 'load_snapshot'))
+        self.close_old_connections = self.enterContext(mock.patch('core.utils.prefetch.close_old_connections'))
+
+    def wait_for(self, condition):
+        deadline = time.monotonic() + 5
+        while not condition():
+            self.assertLess(time.monotonic(), deadline)
+            time.sleep(0.01)
+
+    def test_first_view_starts_refreshes_with_own_connections(self):
+        self.scheduler.touch('DEV1')
+        self.wait_for(lambda: self.scheduler.get_status()['devices']['DEV1']['last_refresh_age'] is not None)
+
+        self.load_snapshot.assert_called_with('DEV1', mock.ANY, revalidate=True)
+        self.assertGreaterEqual(self.close_old_connections.call_count, 2)
+        # The device is forgotten before the mocks are gone
+        self.wait_for(lambda: not self.scheduler.get_status()['devices'])
+
+
+class RowsCacheTest(FakeStarTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.load_snapshot = self.enterContext(mock.patch.object(Project, 'load_snapshot', wraps=Project.load_snapshot))
+
+    def get_rows(self, **headers):
+        return self.client.get(reverse('view_rows', args=['DEV1']), {'sort': 'Priority', 'limit': 10}, **headers)
+
+    def test_unchanged_project_is_not_modified_without_loading(self):
+        response = self.get_rows()
+        self.assertEqual(response.status_code, 200)
+        etag = response.headers['ETag']
+        self.load_snapshot.reset_mock()
+
+        response = self.get_rows(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.headers['ETag'], etag)
+        self.load_snapshot.assert_not_called()
+
+        # The same window of another download of the project is a new version
+        ProjectCache.set_snapshot('DEV1', parse_project('DEV1', self.server.get_project('DEV1')))
+        response = self.get_rows(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.headers['ETag'], etag)
+
+    def test_expired_project_is_loaded_before_answering(self):
+        etag = self.get_rows().headers['ETag']
+        self.load_snapshot.reset_mock()
+
+        with mock.patch.dict(ProjectCache.CONFIG, TTL=0):
+            response = self.get_rows(HTTP_IF_NONE_MATCH=etag)
+        self.load_snapshot.assert_called_once()
+        self.assertIn(response.status_code, (200, 304))
+
+    def test_comments_are_read_from_cached_project(self):
+        snapshot = Project.load_snapshot('DEV1')
+        row = next(row for row in range(snapshot.total_tc) if snapshot.get_value('TPComment', row))
+        self.load_snapshot.reset_mock()
+
+        response = self.client.get(reverse('view_comments', args=['DEV1', row]), {'etag': snapshot.etag})
+        self.assertEqual(response.json(), {'TPComment': snapshot.get_value('TPComment', row),
+                                           'CustomerComments': snapshot.get_value('CustomerComments', row)})
+        response = self.client.get(reverse('view_comments', args=['DEV1', row]), {'etag': 'old'})
+        self.assertEqual(response.status_code, 409)
+        self.load_snapshot.assert_not_called()
+
+
+class ExportTest(FakeStarTestCase):
+
+    def get_csv_lines(self, response) -> list:
+        self.assertEqual(response.status_code, 200)
+        return b''.join(response.streaming_content).decode('utf-8').splitlines()
+
+    def test_export_without_filters_has_every_test_case(self):
+        total = len(Project('DEV1', {}).rows)
+        self.assertGreater(total, 0)
+
+        lines = self.get_csv_lines(self.client.get(reverse('export', args=['DEV1']), {'format': 'csv'}))
+        self.assertEqual(len(lines), total + 1)
+
+        # The placeholders of the form are no filters either
+        lines = self.get_csv_lines(self.client.get(reverse('export', args=['DEV1']),
+                                                   {'format': 'csv', 'Variant': 'None', 'Priority': 'Priority'}))
+        self.assertEqual(len(lines), total + 1)
+
+    def test_export_of_several_devices(self):
+        total = sum(len(Project(device_model, {}).rows) for device_model in self.DEVICE_MODELS)
+
+        lines = self.get_csv_lines(self.client.get(reverse('export_many'),
+                                                   {'format': 'csv', 'device': self.DEVICE_MODELS}))
+        self.assertEqual(len(lines), total + 1)
+
+
+class RegressionsViewTest(FakeStarTestCase):
+
+    def test_regressions_without_filters_compare_every_test_case(self):
+        project = Project('DEV1', {})
+
+        response = self.client.get(reverse('view_regressions', args=['DEV1']))
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data['total'], len(project.rows))
+        self.assertGreater(data['total'], 0)
+        self.assertEqual(data['binaries'], project.list_of_binaries)
+
+    def test_unknown_binary_is_bad_request(self):
+        response = self.client.get(reverse('view_regressions', args=['DEV1']), {'from': 'ZZZ'})
+        self.assertEqual(response.status_code, 400)
+
+
+class SearchIndexCacheTest(TestCase):
+
+    def setUp(self):
+        ProjectCache.clear()
+        self.addCleanup(ProjectCache.clear)
+        # The index is built right away instead of a store thread
+        self.enterContext(mock.patch.object(SnapshotStore, 'run_in_background',
+                                            staticmethod(lambda function, *args: function(*args))))
+        self.add_snapshot = self.enterContext(mock.patch.object(ProjectCache.search_index, 'add_snapshot',
+                                                                wraps=ProjectCache.search_index.add_snapshot))
+
+    def test_revalidated_project_is_not_indexed_again(self):
+        ProjectCache.set_snapshot('A', parse_project('A', make_project(100)))
+        for _ in range(3):
+            # Revalidation puts a copy of the cached snapshot back
+            ProjectCache.set_snapshot('A', ProjectCache.peek_snapshot('A'))
+
+        self.assertEqual(self.add_snapshot.call_count, 1)
+        self.assertEqual(ProjectCache.search_index.get_devices(), ['A'])
+
+    def test_evicted_project_is_removed_from_index(self):
+        snapshots = {device_model: parse_project(device_model, make_project(100)) for device_model in 'ABC'}
+        max_size = snapshots['A'].size * 2 + snapshots['A'].size // 2
+        with mock.patch.dict(ProjectCache.CONFIG, MAX_SIZE=max_size):
+            for device_model, snapshot in snapshots.items():
+                ProjectCache.set_snapshot(device_model, snapshot)
+
+        self.assertFalse(ProjectCache.has_snapshot('A'))
+        self.assertEqual(ProjectCache.search_index.get_devices(), ['B', 'C'])
+
+
+def filter_like_baseline(raw_project: bytes, filters: dict, categories) -> list:
+    """Returns (category, display order, name) of test cases chosen by the original per-row filter"""
+
+    project_etree = parse_xml(raw_project)
+    binaries = [el.get('name') for el in project_etree.xpath('(//xs:sequence)[1]/xs:element', namespaces=NAMESPACES)
+                if el.get('name') not in ('mtp', 'PTN', 'sdf') and len(el.get('name')) == 3]
+
+    test_cases = []
+    for tc in project_etree.xpath('//TestCaseResults2[@diffgr:hasChanges="modified"]', namespaces=NAMESPACES):
+        test_case = {}
+        for el in tc:
+            if el.tag == binaries[-1]:
+                test_case['LastVersionResult'] = el.text
+            if el.tag in NECESSARY_TC_ITEMS and el.text is not None:
+                test_case[el.tag] = el.text
+
+        if 'CategoryName' in test_case and test_case['CategoryName'] not in categories:
+            continue
+        if filters.get('Priority') in PRIORITY_LEVELS and test_case['Priority'] not in PRIORITY_LEVELS[filters['Priority']]:
+            continue
+        if 'Variant' in filters and filters['Variant'] not in test_case:
+            continue
+        if 'tc911' not in filters and 'tc911' in test_case:
+            continue
+
+        has_issue = test_case.get('LastVersionResult') in ('Fail', 'NS', 'Block', 'NT') and \
+            'CustomerComments' not in test_case or \
+            test_case.get('LastVersionResult') == 'Fail' and 'MELDefectType' not in test_case
+        if 'only_blank' in filters and 'LastVersionResult' in test_case and not has_issue:
+            continue
+        test_cases.append(test_case)
+
+    test_cases.sort(key=lambda tc: tc['displayorder'])
+    test_cases.sort(key=lambda tc: tc['CategoryName'])
+    return [(tc['CategoryName'], tc['displayorder'], tc['TestCaseName']) for tc in test_cases]
+
+
+class FilterParityTest(FakeStarTestCase):
+
+    ROWS = 400
+
+    def test_filters_match_baseline(self):
+        raw_project = self.server.get_project('DEV1')
+        selected_ids = [str(category['id']) for category in
+                        sorted(MetadataCache.get_categories(), key=lambda category: category['title'])[:2]]
+
+        for selected, priority, variant, tc911, only_blank in product(
+                (None, selected_ids), (None, 'P0', 'P1', 'P2', 'P3'), (None, *VARIANTS), (False, True), (False, True)):
+            filters = {}
+            if selected is not None:
+                filters['categories'] = selected
+            if priority is not None:
+                filters['Priority'] = priority
+            if variant is not None:
+                filters['Variant'] = variant
+            if tc911:
+                filters['tc911'] = 'on'
+            if only_blank:
+                filters['only_blank'] = 'on'
+
+            with self.subTest(filters=filters):
+                project = Project('DEV1', filters)
+                expected = filter_like_baseline(raw_project, filters,
+                                                MetadataCache.get_category_titles(filters.get('categories')))
+                self.assertEqual([(tc.CategoryName, tc.displayorder, tc.TestCaseName)
+                                  for tc in project.sorted_list_of_tc_by_category], expected)
+
+    def test_test_case_without_category_is_kept(self):
+        raw_project = re.sub(rb'<CategoryName>[^<]*</CategoryName>', b'', make_project(50, 3, 5), count=3)
+        snapshot = parse_project('DEV1', raw_project)
+        without_category = [row for row in range(snapshot.total_tc) if snapshot.get_value('CategoryName', row) is None]
+
+        rows = filter_rows(snapshot, {'tc911': 'on'}, frozenset(['Category 000']))
+        self.assertTrue(without_category)
+        self.assertTrue(set(without_category) <= set(rows))
+        # Test cases without category go first
+        self.assertEqual(rows[:len(without_category)], without_category)
+
+
+class StreamingParseTest(TestCase):
+
+    def test_streaming_parse_matches_buffered_parse(self):
+        raw_project = make_project(300, 5, 5)
+        snapshot = parse_project('DEV1', raw_project)
+        # Chunks cut test cases and tags in the middle
+        streamed = Project.parse_chunks('DEV1', (raw_project[i:i + 1000] for i in range(0, len(raw_project), 1000)))
+
+        self.assertEqual(streamed.list_of_binaries, snapshot.list_of_binaries)
+        self.assertEqual(streamed.total_tc, snapshot.total_tc)
+        self.assertEqual(streamed.etag, snapshot.etag)
+        self.assertEqual(streamed.masks, snapshot.masks)
+        self.assertEqual(streamed.results, snapshot.results)
+        for row in range(snapshot.total_tc):
+            self.assertEqual(streamed.get_test_case(row), snapshot.get_test_case(row))
+
+
+class PackedPayloadTest(TestCase):
+
+    XML = b'<?xml version="1.0"?><Project><Name>DEV1</Name></Project>'
+
+    def get_envelope(self, padding=b'') -> bytes:
+        packed = base64.b64encode(gzip.compress(self.XML))
+        return b'<soap:Envelope>' + padding + b'<Result>' + packed + b'</Result></soap:Envelope>'
+
+    def test_gzip_payload(self):
+        packed = gzip.compress(self.XML)
+
+        self.assertTrue(is_packed_payload(packed[:16]))
+        self.assertEqual(unpack_payload(packed), self.XML)
+
+    def test_base64_gzip_string(self):
+        envelope = self.get_envelope()
+
+        self.assertTrue(is_packed_payload(envelope))
+        self.assertEqual(unpack_payload(envelope), self.XML)
+
+    def test_plain_xml_is_not_unpacked(self):
+        self.assertFalse(is_packed_payload(self.XML))
+        self.assertEqual(unpack_payload(self.XML), self.XML)
+        # The marker in a text of a test case isn't a packed payload
+        self.assertEqual(unpack_payload(b'<a>' + self.XML + b' H4sI</a>'), b'<a>' + self.XML + b' H4sI</a>')
+
+    def test_detection_and_unpacking_scan_the_same_head(self):
+        envelope = self.get_envelope(b' ' * PACKED_PAYLOAD_SCAN)
+
+        self.assertFalse(is_packed_payload(envelope))
+        self.assertEqual(unpack_payload(envelope), envelope)
+
+
+class ProjectCacheTest(TestCase):
+
+    def setUp(self):
+        ProjectCache.clear()
+        self.addCleanup(ProjectCache.clear)
+        self.enterContext(mock.patch.object(SnapshotStore, 'run_in_background',
+                                            staticmethod(lambda function, *args: function(*args))))
+
+    def test_concurrent_misses_load_once(self):
+        snapshot = parse_project('DEV1', make_project(50))
+        loads = []
+
+        def load():
+            loads.append(1)
+            time.sleep(0.2)
+            return snapshot
+
+        with ThreadPoolExecutor(max_workers=5) as pool:
+            futures = [pool.submit(ProjectCache.get_snapshot, 'DEV1', load) for _ in range(5)]
+            etags = [future.result().etag for future in futures]
+
+        self.assertEqual(len(loads), 1)
+        self.assertEqual(etags, [snapshot.etag] * 5)
+
+    def test_least_recently_used_project_is_evicted(self):
+        snapshots = {device_model: parse_project(device_model, make_project(50)) for device_model in 'ABC'}
+        not_loaded = mock.Mock(side_effect=AssertionError('The project should be cached'))
+
+        with mock.patch.dict(ProjectCache.CONFIG, MAX_SIZE=snapshots['A'].size * 2 + snapshots['A'].size // 2):
+            ProjectCache.set_snapshot('A', snapshots['A'])
+            ProjectCache.set_snapshot('B', snapshots['B'])
+            # A is used after B, so B is the least recently used one
+            ProjectCache.get_snapshot('A', not_loaded)
+            ProjectCache.set_snapshot('C', snapshots['C'])
+
+        self.assertTrue(ProjectCache.has_snapshot('A'))
+        self.assertFalse(ProjectCache.has_snapshot('B'))
+        self.assertTrue(ProjectCache.has_snapshot('C'))
+        self.assertEqual(ProjectCache.get_stats()['entries'], 2)
+
+
+    def test_hit_returns_cached_object(self):
+        snapshot = parse_project('DEV1', make_project(50))
+        ProjectCache.set_snapshot('DEV1', snapshot)
+
+        self.assertIs(ProjectCache.get_snapshot('DEV1', mock.Mock(side_effect=AssertionError)), snapshot)
+        self.assertIs(ProjectCache.peek_snapshot('DEV1'), snapshot)
+
+    def test_revalidation_keeps_entry(self):
+        snapshot = parse_project('DEV1', make_project(50))
+        snapshot.last_update = datetime(2024, 1, 1, tzinfo=timezone.utc)
+        ProjectCache.set_snapshot('DEV1', snapshot, checked_at=0)
+
+        with mock.patch.object(ProjectCache, 'get_last_update', return_value=snapshot.last_update), \
+                mock.patch.object(ProjectCache, 'set_snapshot') as set_snapshot:
+            self.assertIs(ProjectCache.get_snapshot('DEV1', mock.Mock(side_effect=AssertionError)), snapshot)
+            # Checked right now, so it's served without asking STAR again
+            self.assertIs(ProjectCache.get_snapshot('DEV1', mock.Mock(side_effect=AssertionError)), snapshot)
+
+        set_snapshot.assert_not_called()
+        self.assertEqual(ProjectCache.get_stats()['revalidations'], 1)
+
+    def test_expired_entry_is_dropped(self):
+        with mock.patch.dict(ProjectCache.CONFIG, KEEP_FOR=0):
+            ProjectCache.set_snapshot('DEV1', parse_project('DEV1', make_project(50)))
+
+        self.assertFalse(ProjectCache.has_snapshot('DEV1'))
+        self.assertIsNone(ProjectCache.peek_snapshot('DEV1'))
+        self.assertEqual(ProjectCache.get_stats()['entries'], 1)
+        ProjectCache.set_snapshot('DEV2', parse_project('DEV2', make_project(50)))
+        self.assertEqual(ProjectCache.get_stats()['entries'], 1)
+
+    def test_unchanged_response_does_not_change_cached_snapshot(self):
+        raw_project = make_project(50)
+        snapshot = parse_project('DEV1', raw_project)
+        timings = snapshot.timings
+
+        reused = Project.parse_response('DEV1', iter([raw_project]), previous=snapshot)
+        reused.compare_with(snapshot)
+        self.assertIsNot(reused, snapshot)
+        self.assertEqual(reused.etag, snapshot.etag)
+        self.assertEqual(reused.timings, {})
+        self.assertEqual(snapshot.timings, timings)
+
+
+class RevalidationTest(TestCase):
+
+    def setUp(self):
+        ProjectCache.clear()
+        self.addCleanup(ProjectCache.clear)
+        self.enterContext(mock.patch.object(SnapshotStore, 'run_in_background',
+                                            staticmethod(lambda function, *args: function(*args))))
+        self.raw_project = make_project(50, 3, 5)
+        self.snapshot = parse_project('DEV1', self.raw_project)
+        self.snapshot.last_update = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+    def test_changed_comment_and_new_test_case(self):
+        changed = parse_project('DEV1', re.sub(rb'<TPComment>[^<]*</TPComment>', b'<TPComment>changed</TPComment>',
+                                               self.raw_project, count=1))
+        changed.compare_with(self.snapshot)
+        row = next(row for row in range(changed.total_tc) if changed.get_value('TPComment', row) == 'changed')
+        self.assertEqual(changed.changes, {row: ('TPComment',)})
+
+        renamed = parse_project('DEV1', self.raw_project.replace(b'<TestCaseName>TC-000001<', b'<TestCaseName>TC-X<'))
+        renamed.compare_with(self.snapshot)
+        self.assertEqual(list(renamed.changes.values()), [('new',)])
+
+        same = parse_project('DEV1', self.raw_project)
+        same.compare_with(self.snapshot)
+        self.assertEqual(same.changes, {})
+
+    def test_expired_project_is_reused_until_updated(self):
+        ProjectCache.set_snapshot('DEV1', self.snapshot, checked_at=0)
+        new_snapshot = parse_project('DEV1', self.raw_project)
+        load = mock.Mock(return_value=new_snapshot)
+
+        with mock.patch.object(ProjectCache, 'get_last_update', return_value=self.snapshot.last_update):
+            self.assertIs(ProjectCache.get_snapshot('DEV1', load, revalidate=True), self.snapshot)
+        load.assert_not_called()
+
+        with mock.patch.object(ProjectCache, 'get_last_update',
+                               return_value=self.snapshot.last_update + timedelta(minutes=1)):
+            self.assertIs(ProjectCache.get_snapshot('DEV1', load, revalidate=True), new_snapshot)
+        load.assert_called_once()
+        self.assertEqual(new_snapshot.changes, {})
+
+    def test_project_is_downloaded_when_update_time_is_unknown(self):
+        ProjectCache.set_snapshot('DEV1', self.snapshot, checked_at=0)
+        load = mock.Mock(return_value=parse_project('DEV1', self.raw_project))
+
+        with mock.patch.object(ProjectCache, 'get_last_update', return_value=None):
+            ProjectCache.get_snapshot('DEV1', load)
+        load.assert_called_once()
+
+
+class SnapshotStoreTest(TestCase):
+
+    def setUp(self):
+        ProjectCache.clear()
+        self.addCleanup(ProjectCache.clear)
+        self.snapshot = parse_project('DEV1', make_project(100, 4, 5))
+        self.snapshot.last_update = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+    def get_test_cases(self, snapshot) -> dict:
+        return {snapshot.get_key(row): tuple(snapshot.get_value(name, row) for name in TEST_CASE_RESULT_FIELDS)
+                for row in range(snapshot.total_tc)}
+
+    def test_stored_project_round_trip(self):
+        SnapshotStore.save(self.snapshot)
+        stored = SnapshotStore.load_latest('DEV1')
+
+        self.assertEqual(stored.list_of_binaries, self.snapshot.list_of_binaries)
+        self.assertEqual(stored.etag, self.snapshot.etag)
+        self.assertEqual(stored.last_update, self.snapshot.last_update)
+        self.assertAlmostEqual(stored.fetched_at, self.snapshot.fetched_at, places=3)
+        self.assertEqual(self.get_test_cases(stored), self.get_test_cases(self.snapshot))
+        # Only results of the two last binaries are stored
+        self.assertFalse(stored.has_all_results)
+        self.assertIsNone(SnapshotStore.load_latest('DEV2'))
+
+    def test_same_response_is_stored_once_and_old_ones_are_removed(self):
+        SnapshotStore.save(self.snapshot)
+        SnapshotStore.save(self.snapshot)
+        self.assertEqual(DeviceSnapshot.objects.count(), 1)
+
+        with mock.patch.dict(SnapshotStore.CONFIG, KEEP_SNAPSHOTS=2):
+            for seed in range(1, 4):
+                snapshot = parse_project('DEV1', make_project(20, seed=seed))
+                SnapshotStore.save(snapshot)
+        self.assertEqual(DeviceSnapshot.objects.count(), 2)
+        self.assertEqual(SnapshotStore.load_latest('DEV1').etag, snapshot.etag)
+
+    def test_stored_project_is_served_and_revalidated(self):
+        SnapshotStore.save(self.snapshot)
+        background = []
+
+        with mock.patch.object(SnapshotStore, 'run_in_background',
+                               staticmethod(lambda function, *args: background.append(function))), \
+                mock.patch.dict(SnapshotStore.CONFIG, SERVE_STORED=True), \
+                mock.patch.object(Project, 'parse_snapshot', side_effect=AssertionError('STAR is not asked')):
+            snapshot = Project.load_snapshot('DEV1')
+
+        self.assertEqual(snapshot.etag, self.snapshot.etag)
+        self.assertTrue(ProjectCache.has_snapshot('DEV1'))
+        self.assertIn(ProjectCache.get_snapshot, background)
+
+
+class LiveUpdatesTest(TestCase):
+
+    def setUp(self):
+        self.raw_project = make_project(50, 3, 5)
+        self.previous = parse_project('DEV1', self.raw_project)
+
+    def get_snapshot(self, raw_project: bytes):
+        snapshot = parse_project('DEV1', raw_project)
+        snapshot.compare_with(self.previous)
+        return snapshot
+
+    async def get_updates(self, queue) -> list:
+        # Updates are put to the queue by callbacks of the loop
+        await asyncio.sleep(0)
+        updates = []
+        while not queue.empty():
+            updates.append(queue.get_nowait())
+        return updates
+
+    async def test_changed_rows_are_pushed_to_subscribers(self):
+        queue = LiveUpdates.subscribe('DEV1')
+        self.addCleanup(LiveUpdates.unsubscribe, 'DEV1', queue)
+        other_queue = LiveUpdates.subscribe('DEV2')
+        self.addCleanup(LiveUpdates.unsubscribe, 'DEV2', other_queue)
+
+        changed = self.get_snapshot(re.sub(rb'<TPComment>[^<]*</TPComment>', b'<TPComment>changed</TPComment>',
+                                           self.raw_project, count=1))
+        LiveUpdates.publish(changed, self.previous, max_rows=500)
+
+        [update] = await self.get_updates(queue)
+        self.assertIs(update.snapshot, changed)
+        self.assertEqual(update.previous_etag, self.previous.etag)
+        self.assertEqual(update.rows, sorted(changed.changes))
+        self.assertFalse(update.reset or update.reload)
+        self.assertEqual(await self.get_updates(other_queue), [])
+
+    async def test_reset_and_reload(self):
+        queue = LiveUpdates.subscribe('DEV1')
+        self.addCleanup(LiveUpdates.unsubscribe, 'DEV1', queue)
+
+        # The same response is not sent
+        LiveUpdates.publish(self.get_snapshot(self.raw_project), self.previous, max_rows=500)
+        self.assertEqual(await self.get_updates(queue), [])
+
+        changed = self.get_snapshot(re.sub(rb'<TPComment>[^<]*</TPComment>', b'<TPComment>changed</TPComment>',
+                                           self.raw_project))
+        LiveUpdates.publish(changed, self.previous, max_rows=1)
+        [update] = await self.get_updates(queue)
+        self.assertTrue(update.reset)
+        self.assertFalse(update.reload)
+        self.assertEqual(update.rows, [])
+
+        LiveUpdates.publish(changed, None, max_rows=500)
+        [update] = await self.get_updates(queue)
+        self.assertTrue(update.reset and update.reload)
+
+
+class ResultMatrixTest(TestCase):
+
+    def setUp(self):
+        self.matrix = ResultMatrix.from_rows(['A', 'B', 'C', 'D'], [
+            ('Pass', 'Fail', 'Pass', 'Fail'),
+            ('Pass', 'NT', None, 'Fail'),
+            (None, 'NT', None, 'NT'),
+            ('Fail', 'Pass', 'Pass', 'Pass'),
+            ('Pass', 'Block', 'Fail', 'Pass'),
+            ('Pass', 'Weird', 'Weird', 'Fail'),
+        ])
+
+    def test_compare_every_binary(self):
+        comparison = self.matrix.compare(range(6), self.matrix.get_columns())
+
+        self.assertEqual(comparison['regressions'], [(0, 'A', 'B'), (0, 'C', 'D'), (1, 'A', 'D')])
+        self.assertEqual(comparison['flaky'], [(0, 3), (4, 2)])
+        self.assertEqual(comparison['never_run'], [2])
+
+    def test_compare_range_of_binaries(self):
+        columns = self.matrix.get_columns('B', 'D')
+        comparison = self.matrix.compare([0, 1, 5], columns)
+
+        self.assertEqual(comparison['regressions'], [(0, 'C', 'D')])
+        self.assertEqual(comparison['flaky'], [(0, 2)])
+        self.assertEqual(comparison['never_run'], [])
+        self.assertEqual(self.matrix.get_results(5, columns), ['Weird', 'Weird', 'Fail'])
+
+    def test_columns_of_unknown_or_reversed_binaries(self):
+        with self.assertRaises(ValueError):
+            self.matrix.get_columns('X')
+        with self.assertRaises(ValueError):
+            self.matrix.get_columns('D', 'A')
+
+
+class TestCaseIndexTest(TestCase):
+
+    def setUp(self):
+        self.index = TestCaseIndex()
+        self.snapshots = {device_model: parse_project(device_model, make_project(200, 3, 5, seed=seed))
+                          for seed, device_model in enumerate(('DEV1', 'DEV2'))}
+        for snapshot in self.snapshots.values():
+            self.index.add_snapshot(snapshot)
+
+    def find(self, query: str, match=lambda snapshot, row: True) -> list:
+        """Returns (device, row) of test cases with every word of the query, by a scan of every text"""
+
+        words = get_words(query)
+        found = []
+        for device_model in sorted(self.snapshots):
+            snapshot = self.snapshots[device_model]
+            for row in range(snapshot.total_tc):
+                texts = ' '.join(snapshot.get_value(name, row) or '' for name in SEARCH_COLUMNS)
+                if words <= get_words(texts) and match(snapshot, row):
+                    found.append((device_model, row))
+        return found
+
+    def search(self, query: str, **kwargs) -> tuple:
+        total, found = self.index.search(query, **kwargs)
+        return total, [(snapshot.device_model, row) for snapshot, row in found]
+
+    def test_search_matches_scan(self):
+        for query in ('lorem', 'Case 17', 'carrier details', 'tp comment 1', 'no_such_word'):
+            with self.subTest(query=query):
+                expected = self.find(query)
+                self.assertEqual(self.search(query), (len(expected), expected))
+
+    def test_search_with_filters(self):
+        expected = self.find('comment', lambda snapshot, row: snapshot.get_value('CategoryName', row) == 'Category 001'
+                             and snapshot.get_value('Priority', row) in PRIORITY_LEVELS['P1']
+                             and snapshot.get_value('LastVersionResult', row) in ('Fail', None))
+        self.assertTrue(expected)
+        self.assertEqual(self.search('comment', categories={'Category 001'}, priority='P1', results={'Fail', None}),
+                         (len(expected), expected))
+
+        expected = self.find('lorem', lambda snapshot, row: snapshot.device_model == 'DEV2')
+        self.assertEqual(self.search('lorem', device_models={'DEV2'}), (len(expected), expected))
+
+    def test_search_window(self):
+        expected = self.find('lorem')
+        # The window crosses from one device to the next
+        offset = self.snapshots['DEV1'].total_tc - 5
+        self.assertEqual(self.search('lorem', offset=offset, limit=10), (len(expected), expected[offset:offset + 10]))
+
+    def test_removed_device_is_not_found(self):
+        self.index.remove('DEV1')
+
+        self.assertEqual(self.index.get_devices(), ['DEV2'])
+        self.assertEqual(self.search('lorem')[1], self.find('lorem', lambda snapshot, row: snapshot.device_model == 'DEV2'))
+
+
+class ProjectIndexTest(TestCase):
+
+    def setUp(self):
+        self.index = ProjectIndex([
+            {'Name': 'SM-A145', 'Last_x0020_Update': datetime(2024, 1, 3, tzinfo=timezone.utc)},
+            {'Name': 'sm-s918', 'Last_x0020_Update': datetime(2024, 1, 1)},
+            {'Name': 'Pixel 8', 'Last_x0020_Update': datetime(2024, 1, 2, tzinfo=timezone.utc)},
+            {'Name': 'XT2345', 'Last_x0020_Update': None},
+        ])
+
+    def get_names(self, *args, **kwargs) -> list:
+        return [project['Name'] for project in self.index.search(*args, **kwargs)]
+
+    def test_search_by_part_of_name(self):
+        self.assertEqual(self.get_names(''), ['SM-A145', 'Pixel 8', 'sm-s918', 'XT2345'])
+        self.assertEqual(self.get_names('SM-'), ['SM-A145', 'sm-s918'])
+        self.assertEqual(self.get_names('8'), ['Pixel 8', 'sm-s918'])
+        self.assertEqual(self.get_names('5\n'), ['SM-A145', 'XT2345'])
+        self.assertEqual(self.get_names('galaxy'), [])
+
+    def test_search_by_prefix(self):
+        self.assertEqual(self.get_names('sm', prefix=True), ['SM-A145', 'sm-s918'])
+        self.assertEqual(self.get_names('45', prefix=True), [])
+
+    def test_sort_by_name(self):
+        self.assertEqual(self.get_names('', sort='name'), ['Pixel 8', 'SM-A145', 'sm-s918', 'XT2345'])
+
+    def test_last_update(self):
+        self.assertEqual(self.index.get_last_update('Pixel 8'), datetime(2024, 1, 2, tzinfo=timezone.utc))
+        self.assertIsNone(self.index.get_last_update('unknown'))
+
+
+class RawArchiveTest(TestCase):
+
+    def setUp(self):
+        directory = self.enterContext(tempfile.TemporaryDirectory())
+        self.enterContext(mock.patch.dict(RawArchive.CONFIG, ENABLED=True, DIR=directory, KEEP_PER_DEVICE=2,
+                                          KEEP_FOR_DAYS=30))
+        self.background = []
+        self.enterContext(mock.patch.object(SnapshotStore, 'run_in_background',
+                                            staticmethod(lambda function, *args: self.background.append((function, args)))))
+
+    def record(self, device_model: str, raw_project: bytes) -> str:
+        """Archives the response and returns its digest, its entry is added by run_background()"""
+
+        chunks = [raw_project[i:i + 1000] for i in range(0, len(raw_project), 1000)]
+        self.assertEqual(b''.join(RawArchive.record(device_model, chunks)), raw_project)
+        return parse_project(device_model, raw_project).etag
+
+    def run_background(self):
+        while self.background:
+            function, args = self.background.pop(0)
+            function(*args)
+
+    def test_old_responses_and_their_files_are_removed(self):
+        raw_projects = [make_project(50, seed=seed) for seed in range(3)]
+        digests = []
+        for raw_project in raw_projects:
+            digests.append(self.record('A', raw_project))
+            self.run_background()
+        # B has the newest response of A, its file is kept with either entry
+        self.record('B', raw_projects[2])
+        self.run_background()
+
+        self.assertEqual(list(ArchivedResponse.objects.filter(device_model='A').values_list('digest', flat=True)),
+                         digests[:0:-1])
+        self.assertFalse(os.path.exists(RawArchive.get_path(digests[0])))
+        self.assertTrue(os.path.exists(RawArchive.get_path(digests[2])))
+        self.assertEqual(b''.join(RawArchive.iter_latest_response('B')), raw_projects[2])
+
+    def test_file_of_response_being_recorded_is_not_removed(self):
+        raw_project = make_project(50)
+        old = datetime.now(tz=timezone.utc) - timedelta(days=60)
+        digest = parse_project('A', raw_project).etag
+        ArchivedResponse.objects.create(device_model='B', digest=digest, fetched_at=old)
+
+        # The file is written, its entry of A is not in the database yet when B's old one is removed
+        self.record('A', raw_project)
+        pending_add = self.background.pop()
+        RawArchive.add('B', '0' * 40, 1, 1, datetime.now(tz=timezone.utc))
+        self.assertTrue(os.path.exists(RawArchive.get_path(digest)))
+
+        pending_add[0](*pending_add[1])
+        self.assertEqual(RawArchive.get_latest('A').digest, digest)
+        self.assertFalse(ArchivedResponse.objects.filter(device_model='B', digest=digest).exists())
+        self.assertEqual(b''.join(RawArchive.iter_response(digest)), raw_project)
+
+    def test_replay_project(self):
+        raw_projects = [make_project(50, seed=0), make_project(80, seed=1)]
+        digests = []
+        for raw_project in raw_projects:
+            digests.append(self.record('A', raw_project))
+            self.run_background()
+
+        for streaming in (False, True):
+            with self.subTest(streaming=streaming):
+                self.assertEqual(Project.replay('A', streaming=streaming).snapshot.etag, digests[1])
+                self.assertEqual(Project.replay('A', digests[0], streaming=streaming).snapshot.etag, digests[0])
+
+        stdout = io.StringIO()
+        call_command('replay_project', 'A', '--repeat', '2', stdout=stdout)
+        self.assertIn(f'A {digests[1]}: {parse_project("A", raw_projects[1]).total_tc} test cases', stdout.getvalue())
+        self.assertIn('Parsed 2 times', stdout.getvalue())
+
+
+class SpilledColumnTest(TestCase):
+
+    def setUp(self):
+        raw_project = make_project(300, 3, 5)
+        self.snapshot = parse_project('DEV1', raw_project)
+        self.spilled = parse_project('DEV1', raw_project)
+        directory = self.enterContext(tempfile.TemporaryDirectory())
+        SpillDirectory(parent=directory).spill(self.spilled)
+        self.rows = filter_rows(self.snapshot, {'tc911': 'on'}, frozenset(get_categories(5)))
+
+    def count_queries(self, function):
+        """Returns the result of the function and how many queries it has made to the spilled texts"""
+
+        connection = get_connection(self.spilled.text_columns['TPComment'].path)
+        queries = []
+        connection.set_trace_callback(queries.append)
+        try:
+            return function(), len(queries)
+        finally:
+            connection.set_trace_callback(None)
+
+    def test_texts_round_trip(self):
+        for name in SPILLED_COLUMNS:
+            with self.subTest(name=name):
+                column = self.spilled.text_columns[name]
+                expected = self.snapshot.text_columns[name]
+                self.assertIsInstance(column, SpilledColumn)
+                self.assertTrue(any(expected))
+                self.assertEqual(list(column), expected)
+                self.assertEqual([column[row] for row in range(len(column))], expected)
+                self.assertEqual(column.get_values(), expected)
+                self.assertEqual(column.get_values(self.rows[::-1]), [expected[row] for row in self.rows[::-1]])
+                self.assertEqual(column.get_values([]), [])
+
+    def test_sort_reads_column_at_once(self):
+        for sort_key in ('TestDescription', '-TestCriteria'):
+            with self.subTest(sort_key=sort_key):
+                rows, queries = self.count_queries(lambda: sort_rows(self.spilled, self.rows, sort_key))
+                self.assertEqual(rows, sort_rows(self.snapshot, self.rows, sort_key))
+                self.assertEqual(queries, 1)
+
+    def test_compare_reads_columns_at_once(self):
+        previous = parse_project('DEV1', make_project(300, 3, 5, seed=1))
+
+        _, queries = self.count_queries(lambda: self.spilled.compare_with(previous))
+        self.snapshot.compare_with(previous)
+        self.assertEqual(self.spilled.changes, self.snapshot.changes)
+        self.assertEqual(queries, len(set(SPILLED_COLUMNS) & set(DIFF_COLUMNS)))
+
+    def test_export_of_spilled_project(self):
+        with mock.patch.object(MetadataCache, 'get_category_titles', return_value=frozenset(get_categories(5))):
+            project = Project('DEV1', {'tc911': 'on'}, snapshot=self.snapshot)
+            spilled_project = Project('DEV1', {'tc911': 'on'}, snapshot=self.spilled)
+            rows, queries = self.count_queries(lambda: list(iter_rows([spilled_project])))
+            self.assertEqual(rows, list(iter_rows([project])))
+        self.assertEqual(len(rows), len(self.rows))
+        self.assertLessEqual(queries, len(SPILLED_COLUMNS) * -(-len(rows) // ROWS_BATCH_SIZE))
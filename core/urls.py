@@ -4,7 +4,26 @@ from django.conf import settings
 from django.conf.urls.static import static
 from .views import *
 
+# Async views let one ASGI worker wait for STAR for many devices at once
+if settings.STAR_ASYNC_VIEWS:
+    index, view = index_async, view_async
+
 urlpatterns = [
     path('', index, name='index'),
-    path('view/<str:device_name>', view, name='view')
-]
\ No newline at end of file
+    path('projects/search', search_projects, name='search_projects'),
+    path('search', search_test_cases, name='search_test_cases'),
+    path('view/<str:device_name>', view, name='view'),
+    path('view/<str:device_name>/rows', view_rows, name='view_rows'),
+    path('view/<str:device_name>/comments/<int:row>', view_comments, name='view_comments'),
+    path('view/<str:device_name>/regressions', view_regressions, name='view_regressions'),
+    path('view/<str:device_name>/export', export, name='export'),
+    path('export', export, name='export_many'),
+    path('dashboard', dashboard, name='dashboard'),
+    path('dashboard/status', dashboard_status, name='dashboard_status'),
+    path('prefetch/status', prefetch_status, name='prefetch_status'),
+    path('metrics', metrics, name='metrics')
+]
+
+# Live updates keep a response open for every page, which only ASGI servers can afford
+if settings.STAR_LIVE_UPDATES['ENABLED']:
+    urlpatterns.append(path('view/<str:device_name>/live', view_live, name='view_live'))
\ No newline at end of file
@@ -0,0 +1,153 @@
+import gzip
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from functools import partial
+from typing import Iterable, Iterator, Optional
+from django.conf import settings
+from django.db.models import Q
+from core.models import ArchivedResponse
+from core.utils.store import SnapshotStore
+
+logger = logging.getLogger(__name__)
+
+class RawArchive:
+    """Archives raw STAR responses on disk, gzip-compressed and addressed by their SHA-1.
+
+    The SHA-1 is the etag of the parsed project, so a response can be found
+    by its snapshot, and identical responses are one file however often
+    they are downloaded. Which device got which response and when is kept
+    in the database, old entries are removed by the retention policy and a
+    file goes with its last entry. A project can be replayed from the
+    archive instead of STAR to debug or benchmark its parsing offline.
+    """
+
+    CONFIG = settings.STAR_RAW_ARCHIVE
+
+    CHUNK_SIZE = 1024 * 1024
+
+    # Files are written by request threads and removed by store threads: a file which has
+    # been written but not recorded in the database yet is pending and never removed
+    __lock = threading.Lock()
+    __pending = Counter()
+
+    @classmethod
+    def get_path(cls, digest: str) -> str:
+        return os.path.join(cls.CONFIG['DIR'], digest[:2], f'{digest}.xml.gz')
+
+    @classmethod
+    def record(cls, device_model: str, chunks: Iterable[bytes]) -> Iterator[bytes]:
+        """Yields chunks of a response while they are compressed to the archive.
+
+        The response is archived once the chunks are exhausted, a response
+        which fails or isn't read to the end is dropped.
+        """
+
+        os.makedirs(cls.CONFIG['DIR'], exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(suffix='.tmp', dir=cls.CONFIG['DIR'])
+        digest = hashlib.sha1()
+        size = 0
+        try:
+            # mtime is fixed, so the same response is always the same file
+            with open(fd, 'wb') as raw_file, \
+                    gzip.GzipFile(fileobj=raw_file, mode='wb', compresslevel=cls.CONFIG['COMPRESS_LEVEL'],
+                                  mtime=0) as gzip_file:
+                for chunk in chunks:
+                    digest.update(chunk)
+                    size += len(chunk)
+                    gzip_file.write(chunk)
+                    yield chunk
+
+            digest = digest.hexdigest()
+            path = cls.get_path(digest)
+            compressed_size = os.path.getsize(temp_path)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with cls.__lock:
+                os.replace(temp_path, path)
+                cls.__pending[digest] += 1
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+        logger.info('The response of %s has been archived as %s (%d bytes, %d compressed)',
+                    device_model, digest, size, compressed_size)
+        SnapshotStore.run_in_background(cls.add, device_model, digest, size, compressed_size,
+                                        datetime.now(tz=timezone.utc))
+
+    @classmethod
+    def add(cls, device_model: str, digest: str, size: int, compressed_size: int, fetched_at: datetime):
+        """Records an archived response of the device and applies the retention policy"""
+
+        try:
+            latest = cls.get_latest(device_model)
+            if latest is not None and latest.digest == digest:
+                # The same response as the last one only moves its time
+                latest.fetched_at = fetched_at
+                latest.save(update_fields=['fetched_at'])
+            else:
+                ArchivedResponse.objects.create(device_model=device_model,
+                                                digest=digest,
+                                                size=size,
+                                                compressed_size=compressed_size,
+                                                fetched_at=fetched_at)
+        finally:
+            with cls.__lock:
+                cls.__pending[digest] -= 1
+                if not cls.__pending[digest]:
+                    del cls.__pending[digest]
+        cls.__remove_old_responses(device_model)
+
+    @classmethod
+    def get_latest(cls, device_model: str) -> Optional[ArchivedResponse]:
+        """Returns the newest archived response of the device, None if nothing is archived"""
+
+        return ArchivedResponse.objects.filter(device_model=device_model).first()
+
+    @classmethod
+    def iter_response(cls, digest: str) -> Iterator[bytes]:
+        """Returns chunks of an archived response, raises FileNotFoundError if it's not archived"""
+
+        gzip_file = gzip.open(cls.get_path(digest), 'rb')
+        return cls.__iter_file(gzip_file)
+
+    @classmethod
+    def iter_latest_response(cls, device_model: str) -> Iterator[bytes]:
+        """Returns chunks of the newest archived response of the device, raises LookupError if there is none"""
+
+        latest = cls.get_latest(device_model)
+        if latest is None:
+            raise LookupError(f'No response of {device_model} has been archived')
+        return cls.iter_response(latest.digest)
+
+    @classmethod
+    def __iter_file(cls, gzip_file) -> Iterator[bytes]:
+        with gzip_file:
+            yield from iter(partial(gzip_file.read, cls.CHUNK_SIZE), b'')
+
+    @classmethod
+    def __remove_old_responses(cls, device_model: str):
+        old_ids = ArchivedResponse.objects.filter(device_model=device_model) \
+            .values_list('id', flat=True)[cls.CONFIG['KEEP_PER_DEVICE']:]
+        old = Q(id__in=list(old_ids))
+        if cls.CONFIG['KEEP_FOR_DAYS'] is not None:
+            old |= Q(fetched_at__lt=datetime.now(tz=timezone.utc) - timedelta(days=cls.CONFIG['KEEP_FOR_DAYS']))
+
+        with cls.__lock:
+            old_responses = ArchivedResponse.objects.filter(old)
+            digests = set(old_responses.values_list('digest', flat=True))
+            if not digests:
+                return
+            old_responses.delete()
+
+            # A file is shared by every entry with its digest, of any device, and by pending responses
+            kept = set(ArchivedResponse.objects.filter(digest__in=digests).values_list('digest', flat=True))
+            for digest in digests - kept - cls.__pending.keys():
+                try:
+                    os.remove(cls.get_path(digest))
+                except FileNotFoundError:
+                    pass
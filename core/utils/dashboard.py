@@ -0,0 +1,106 @@
+import logging
+import threading
+from datetime import timedelta
+from django.conf import settings
+from django.db import close_old_connections
+from django.utils import timezone
+from core.models import DeviceSummary
+from core.utils.star import Project, ProjectCache
+from core.utils.store import to_aware
+
+logger = logging.getLogger(__name__)
+
+class Dashboard:
+    """Counts results and issues of every active device for the dashboard.
+
+    Projects are loaded by Project.load_many, and the summary of every device
+    is saved as soon as it's parsed, so the dashboard fills in while the rest
+    of the devices are still loading.
+    """
+
+    CONFIG = settings.STAR_DASHBOARD
+
+    __lock = threading.Lock()
+    __progress = {'running': False, 'done': 0, 'failed': 0, 'total': 0, 'started_at': None, 'finished_at': None}
+
+    @classmethod
+    def get_active_devices(cls) -> list:
+        """Returns devices updated in STAR within ACTIVE_FOR_DAYS, newest first"""
+
+        projects = ProjectCache.get_projects()
+        if cls.CONFIG['ACTIVE_FOR_DAYS'] is None:
+            return [project['Name'] for project in projects]
+
+        updated_after = timezone.now() - timedelta(days=cls.CONFIG['ACTIVE_FOR_DAYS'])
+        return [project['Name'] for project in projects
+                if project.get('Last_x0020_Update') and to_aware(project['Last_x0020_Update']) >= updated_after]
+
+    @classmethod
+    def get_progress(cls) -> dict:
+        with cls.__lock:
+            return dict(cls.__progress)
+
+    @classmethod
+    def refresh(cls, device_models=None, fresh=False, download_workers=None, parse_workers=None):
+        """Loads projects and saves their summaries, yields (device model, DeviceSummary) as they finish"""
+
+        device_models = list(dict.fromkeys(device_models or cls.get_active_devices()))
+        with cls.__lock:
+            cls.__progress.update(running=True, done=0, failed=0, total=len(device_models),
+                                  started_at=timezone.now(), finished_at=None)
+        try:
+            projects = Project.load_many(device_models, fresh=fresh,
+                                         download_workers=download_workers,
+                                         parse_workers=parse_workers)
+            for device_model, project in projects:
+                device_summary = cls.__save(device_model, project)
+                with cls.__lock:
+                    cls.__progress['failed' if device_summary.error else 'done'] += 1
+                yield device_model, device_summary
+        finally:
+            with cls.__lock:
+                cls.__progress.update(running=False, finished_at=timezone.now())
+
+    @classmethod
+    def start_refresh(cls, fresh=False) -> bool:
+        """Refreshes the dashboard in a background thread, False if it's already refreshing"""
+
+        with cls.__lock:
+            if cls.__progress['running']:
+                return False
+            cls.__progress['running'] = True
+
+        threading.Thread(target=cls.__refresh_in_thread, args=(fresh,), name='star-dashboard', daemon=True).start()
+        return True
+
+    @classmethod
+    def __refresh_in_thread(cls, fresh: bool):
+        close_old_connections()
+        try:
+            for _ in cls.refresh(fresh=fresh):
+                pass
+        except Exception:
+            logger.exception('The dashboard has not been refreshed')
+            with cls.__lock:
+                cls.__progress['running'] = False
+        finally:
+            close_old_connections()
+
+    @classmethod
+    def __save(cls, device_model: str, project) -> DeviceSummary:
+        if isinstance(project, Exception):
+            # The last counts of the device are kept along with the error
+            device_summary, _ = DeviceSummary.objects.update_or_create(
+                device_model=device_model,
+                defaults={'error': repr(project), 'computed_at': timezone.now()})
+            return device_summary
+
+        snapshot = project.snapshot
+        device_summary, _ = DeviceSummary.objects.update_or_create(
+            device_model=device_model,
+            defaults={'binary_version': snapshot.current_binary_version,
+                      'total_tc': snapshot.total_tc,
+                      'summary': snapshot.get_summary(),
+                      'error': '',
+                      'computed_at': timezone.now()})
+        return device_summary
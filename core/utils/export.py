@@ -0,0 +1,93 @@
+import csv
+import json
+from tempfile import SpooledTemporaryFile
+from typing import Iterable, Iterator
+
+try:
+    from openpyxl import Workbook
+except ImportError:
+    # XLSX export is available only when openpyxl is installed
+    Workbook = None
+
+
+# Headers of exported columns and names of snapshot columns
+EXPORT_COLUMNS = (
+    ('TC#', 'displayorder'),
+    ('Category', 'CategoryName'),
+    ('Priority', 'Priority'),
+    ('Test case', 'TestCaseName'),
+    ('Description', 'TestDescription'),
+    ('Criteria', 'TestCriteria'),
+    ('911', 'tc911'),
+    ('Previous result', 'PreviousVersionResult'),
+    ('Last result', 'LastVersionResult'),
+    ('TP comment', 'TPComment'),
+    ('Comments for carrier', 'CustomerComments'),
+    ('Issue', 'issue'),
+)
+
+HEADERS = ('Device', 'Previous binary', 'Last binary') + tuple(header for header, _ in EXPORT_COLUMNS)
+
+EXPORT_FORMATS = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+}
+
+XLSX_MEMORY_LIMIT = 8 * 1024 * 1024
+
+# Rows whose values are read at once, column by column
+ROWS_BATCH_SIZE = 1000
+
+def is_format_supported(export_format: str) -> bool:
+    return export_format in EXPORT_FORMATS and (export_format != 'xlsx' or Workbook is not None)
+
+class Echo:
+    """File-like object which returns written line instead of keeping it"""
+
+    def write(self, value):
+        return value
+
+def iter_rows(projects: Iterable) -> Iterator[tuple]:
+    """Yields exported values of filtered test cases of every project one by one"""
+
+    for project in projects:
+        snapshot = project.snapshot
+        binaries = (snapshot.device_model, snapshot.previous_binary_version, snapshot.current_binary_version)
+        rows = project.rows
+        for start in range(0, len(rows), ROWS_BATCH_SIZE):
+            batch = rows[start:start + ROWS_BATCH_SIZE]
+            columns = [snapshot.get_values(name, batch) for _, name in EXPORT_COLUMNS]
+            for values in zip(*columns):
+                yield binaries + values
+
+def iter_csv(rows: Iterable[tuple]) -> Iterator[str]:
+    writer = csv.writer(Echo())
+    yield writer.writerow(HEADERS)
+    for row in rows:
+        yield writer.writerow(row)
+
+def iter_ndjson(rows: Iterable[tuple]) -> Iterator[str]:
+    for row in rows:
+        yield json.dumps(dict(zip(HEADERS, row)), ensure_ascii=False) + '\n'
+
+def write_xlsx(rows: Iterable[tuple]):
+    """Returns a file with the XLSX workbook, rows are written in openpyxl write-only mode.
+
+    An XLSX file is a zip archive which can't be sent before it's complete,
+    so big workbooks are spilled to a temporary file instead of memory.
+    """
+
+    if Workbook is None:
+        raise RuntimeError('openpyxl is required for XLSX export')
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet('Test cases')
+    sheet.append(HEADERS)
+    for row in rows:
+        sheet.append(row)
+
+    xlsx_file = SpooledTemporaryFile(max_size=XLSX_MEMORY_LIMIT)
+    workbook.save(xlsx_file)
+    xlsx_file.seek(0)
+    return xlsx_file
@@ -0,0 +1,79 @@
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timezone
+from typing import Optional
+
+
+OLDEST = datetime.min.replace(tzinfo=timezone.utc)
+
+SORT_KEYS = ('update', 'name')
+
+def get_update_key(project: dict) -> datetime:
+    """Returns the last update of the project to sort by, naive time is taken as UTC"""
+
+    last_update = project.get('Last_x0020_Update')
+    if last_update is None:
+        return OLDEST
+    return last_update if last_update.tzinfo else last_update.replace(tzinfo=timezone.utc)
+
+class ProjectIndex:
+    """Parsed list of projects with a search index on device names.
+
+    Names are kept lowercased in sorted order for prefix search, and joined
+    into one string for substring search, so a search is a bisect or a few
+    str.find calls instead of a Python loop over every device.
+    """
+
+    def __init__(self, projects: list):
+        self.projects = sorted(projects, key=get_update_key, reverse=True)
+        self.by_name = {project.get('Name'): project for project in self.projects}
+
+        names = [(project.get('Name') or '').lower() for project in self.projects]
+        self.__sorted_names = sorted((name, position) for position, name in enumerate(names))
+        self.__sorted_keys = [name for name, _ in self.__sorted_names]
+
+        # Every name ends with a newline, which can't be a part of a query
+        self.__names = ''.join(name + '\n' for name in names)
+        self.__offsets = []
+        offset = 0
+        for name in names:
+            self.__offsets.append(offset)
+            offset += len(name) + 1
+
+    def __len__(self) -> int:
+        return len(self.projects)
+
+    def get_last_update(self, device_model: str) -> Optional[datetime]:
+        project = self.by_name.get(device_model)
+        return None if project is None else project.get('Last_x0020_Update')
+
+    def search(self, query='', sort='update', prefix=False) -> list:
+        """Returns projects which names contain the query, or start with it, case insensitive.
+
+        Projects are sorted by last update, newest first, or by name.
+        """
+
+        query = query.strip().lower().replace('\n', '')
+        if not query:
+            positions = range(len(self.projects))
+        elif prefix:
+            start = bisect_left(self.__sorted_keys, query)
+            end = bisect_right(self.__sorted_keys, query + '\uffff', start)
+            positions = sorted(position for _, position in self.__sorted_names[start:end])
+        else:
+            positions = self.__find(query)
+
+        projects = [self.projects[position] for position in positions]
+        if sort == 'name':
+            projects.sort(key=lambda project: (project.get('Name') or '').lower())
+        return projects
+
+    def __find(self, query: str) -> list:
+        positions = []
+        start = self.__names.find(query)
+        while start != -1:
+            position = bisect_right(self.__offsets, start) - 1
+            positions.append(position)
+            # The next match is looked for in the next name
+            next_offset = self.__offsets[position + 1] if position + 1 < len(self.__offsets) else len(self.__names)
+            start = self.__names.find(query, next_offset)
+        return positions
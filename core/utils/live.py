@@ -0,0 +1,96 @@
+import asyncio
+import logging
+import threading
+from typing import Callable
+from core.utils.snapshot import ProjectSnapshot
+
+logger = logging.getLogger(__name__)
+
+class LiveUpdate:
+    """Changes of a device project between two downloads, shared by every page of the device.
+
+    The pages differ only by filters, so what is sent to them is made once
+    for every set of filters.
+    """
+
+    def __init__(self, snapshot: ProjectSnapshot, previous_etag: str, reset: bool, reload: bool, rows: list):
+        self.snapshot = snapshot
+        self.previous_etag = previous_etag
+        self.reset = reset
+        self.reload = reload
+        self.rows = rows
+        self.__json = {}
+
+    def get_json(self, key, make_json: Callable[[], dict]) -> dict:
+        json = self.__json.get(key)
+        if json is None:
+            json = self.__json[key] = make_json()
+        return json
+
+class LiveUpdates:
+    """Pushes changes of device projects to the pages which show them.
+
+    A new download of a project is compared with the previous one once, by
+    the thread which loaded it, and the changes are put to the queue of
+    every page subscribed to the device. So the work grows with the number
+    of changes, not with the number of open pages.
+    """
+
+    __lock = threading.Lock()
+    __subscribers = {}
+
+    @classmethod
+    def subscribe(cls, device_model: str) -> asyncio.Queue:
+        """Returns a queue of LiveUpdate of the device for the running event loop"""
+
+        queue = asyncio.Queue()
+        with cls.__lock:
+            cls.__subscribers.setdefault(device_model, {})[queue] = asyncio.get_running_loop()
+        return queue
+
+    @classmethod
+    def unsubscribe(cls, device_model: str, queue: asyncio.Queue):
+        with cls.__lock:
+            subscribers = cls.__subscribers.get(device_model, {})
+            subscribers.pop(queue, None)
+            if not subscribers:
+                cls.__subscribers.pop(device_model, None)
+
+    @classmethod
+    def get_subscribers_count(cls) -> int:
+        with cls.__lock:
+            return sum(len(subscribers) for subscribers in cls.__subscribers.values())
+
+    @classmethod
+    def publish(cls, snapshot: ProjectSnapshot, previous, max_rows: int):
+        """Sends changes of the snapshot since the previous one of the device, which may be None.
+
+        The table is reset when test cases are added or removed, or when there
+        are more than `max_rows` changes, and the page is reloaded when there
+        is a new binary.
+        """
+
+        with cls.__lock:
+            subscribers = list(cls.__subscribers.get(snapshot.device_model, {}).items())
+        if not subscribers:
+            return
+
+        if previous is not None and previous.etag and previous.etag == snapshot.etag and not snapshot.changes:
+            return
+
+        reload = previous is None or previous.list_of_binaries[-2:] != snapshot.list_of_binaries[-2:]
+        reset = reload or previous.total_tc != snapshot.total_tc or len(snapshot.changes) > max_rows or \
+            any('new' in columns for columns in snapshot.changes.values())
+        previous_etag = (previous.etag or '') if previous is not None else ''
+        update = LiveUpdate(snapshot,
+                            previous_etag,
+                            reset,
+                            reload,
+                            [] if reset else sorted(snapshot.changes))
+
+        for queue, loop in subscribers:
+            try:
+                loop.call_soon_threadsafe(queue.put_nowait, update)
+            except RuntimeError:
+                # The loop of the page is closed, it's unsubscribed when its response ends
+                logger.debug('Live update of %s has not been sent to a closed loop', snapshot.device_model)
@@ -0,0 +1,86 @@
+import threading
+from asgiref.sync import sync_to_async
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+from core.models import Category, Team
+
+
+class MetadataCache:
+    """Keeps active categories and teams with their categories in memory.
+
+    The metadata is loaded on first use and dropped whenever a category or
+    a team is changed, so edits made in the admin are seen by the next request.
+    """
+
+    __lock = threading.Lock()
+    __metadata = None
+
+    @classmethod
+    def get_categories(cls) -> list:
+        """Returns ids and titles of active categories"""
+
+        return cls.get_metadata()['categories']
+
+    @classmethod
+    def get_teams(cls) -> list:
+        """Returns teams with ids and titles of their categories"""
+
+        return cls.get_metadata()['teams']
+
+    @classmethod
+    def get_category_titles(cls, category_ids=None) -> frozenset:
+        """Returns titles of active categories, only of the given ids if they are passed"""
+
+        metadata = cls.get_metadata()
+        if category_ids is None:
+            return metadata['category_titles']
+        titles_by_id = metadata['titles_by_id']
+        return frozenset(titles_by_id[category_id] for category_id in map(str, category_ids)
+                         if category_id in titles_by_id)
+
+    @classmethod
+    def get_metadata(cls) -> dict:
+        metadata = cls.__metadata
+        if metadata is not None:
+            return metadata
+
+        with cls.__lock:
+            if cls.__metadata is None:
+                cls.__metadata = cls.__load()
+            return cls.__metadata
+
+    @classmethod
+    async def aget_metadata(cls) -> dict:
+        return await sync_to_async(cls.get_metadata)()
+
+    @classmethod
+    def invalidate(cls):
+        with cls.__lock:
+            cls.__metadata = None
+
+    @classmethod
+    def __load(cls) -> dict:
+        categories = list(Category.objects.filter(is_active=True).values('id', 'title'))
+
+        teams = []
+        for team in Team.objects.prefetch_related('categories'):
+            teams.append({
+                'team_id': 'team_' + str(team.id),
+                'team_name': team.name,
+                'team_categories': [{'id': category.id, 'title': category.title}
+                                    for category in team.categories.all()],
+            })
+
+        return {'categories': categories,
+                'teams': teams,
+                # Ids come from forms and cookies as strings
+                'titles_by_id': {str(category['id']): category['title'] for category in categories},
+                'category_titles': frozenset(category['title'] for category in categories)}
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=Team)
+@receiver(post_delete, sender=Team)
+@receiver(m2m_changed, sender=Team.categories.through)
+def invalidate_metadata(sender, **kwargs):
+    MetadataCache.invalidate()
@@ -0,0 +1,136 @@
+import logging
+import threading
+import tracemalloc
+from contextlib import contextmanager
+from contextvars import ContextVar
+from timeit import default_timer as timer
+
+try:
+    import resource
+except ImportError:
+    # There is no resource module on Windows, peak RSS is not reported there
+    resource = None
+
+
+logger = logging.getLogger(__name__)
+
+# Stages of the request, in order of the pipeline
+STAGES = ('request_build', 'ttfb', 'transfer', 'xml_parse', 'record_build', 'load',
+          'filter', 'sort', 'compare', 'search', 'render')
+
+# Timings of the current request, None outside of collect_timings()
+request_timings = ContextVar('request_timings', default=None)
+
+def get_peak_rss() -> int:
+    """Returns peak resident set size of the process in bytes, 0 if it's unknown"""
+
+    if resource is None:
+        return 0
+    # Linux reports kilobytes
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+class Metrics:
+    """Collects durations of every stage per device and bytes received from STAR.
+
+    Every record is also logged to the core.utils.metrics logger and added to
+    timings of the current request, which are shown on the page in DEBUG.
+    """
+
+    __lock = threading.Lock()
+    __stages = {}
+    __bytes_received = {}
+    __memory_growth = {}
+
+    @classmethod
+    def record(cls, stage: str, seconds: float, device_model='', memory_growth=0):
+        with cls.__lock:
+            count, total, maximum = cls.__stages.get((stage, device_model), (0, 0.0, 0.0))
+            cls.__stages[stage, device_model] = (count + 1, total + seconds, max(maximum, seconds))
+            if memory_growth:
+                cls.__memory_growth[stage] = cls.__memory_growth.get(stage, 0) + memory_growth
+
+        timings = request_timings.get()
+        if timings is not None:
+            timings.append((stage, device_model, seconds))
+
+        logger.info('%s %s %.3f s', stage, device_model, seconds,
+                    extra={'stage': stage, 'device_model': device_model, 'seconds': seconds})
+
+    @classmethod
+    def record_timings(cls, timings: dict, device_model=''):
+        """Records stages measured where metrics can't be reached, like a parse process"""
+
+        for stage, seconds in timings.items():
+            cls.record(stage, seconds, device_model)
+
+    @classmethod
+    def count_bytes(cls, device_model: str, size: int):
+        with cls.__lock:
+            cls.__bytes_received[device_model] = cls.__bytes_received.get(device_model, 0) + size
+        logger.info('bytes_received %s %d', device_model, size,
+                    extra={'device_model': device_model, 'bytes': size})
+
+    @classmethod
+    def render(cls) -> str:
+        """Returns all metrics in Prometheus text format"""
+
+        lines = ['# TYPE starlight_stage_seconds summary']
+        with cls.__lock:
+            for (stage, device_model), (count, total, maximum) in sorted(cls.__stages.items(), key=get_stage_key):
+                labels = f'stage="{stage}",device="{escape_label(device_model)}"'
+                lines.append(f'starlight_stage_seconds_count{{{labels}}} {count}')
+                lines.append(f'starlight_stage_seconds_sum{{{labels}}} {total:.6f}')
+                lines.append(f'starlight_stage_seconds_max{{{labels}}} {maximum:.6f}')
+
+            lines.append('# TYPE starlight_bytes_received_total counter')
+            for device_model, size in sorted(cls.__bytes_received.items()):
+                lines.append(f'starlight_bytes_received_total{{device="{escape_label(device_model)}"}} {size}')
+
+            lines.append('# TYPE starlight_stage_memory_growth_bytes_total counter')
+            for stage, size in sorted(cls.__memory_growth.items()):
+                lines.append(f'starlight_stage_memory_growth_bytes_total{{stage="{stage}"}} {size}')
+
+        lines.append('# TYPE starlight_peak_rss_bytes gauge')
+        lines.append(f'starlight_peak_rss_bytes {get_peak_rss()}')
+        return '\n'.join(lines) + '\n'
+
+def get_stage_key(item) -> tuple:
+    (stage, device_model), _ = item
+    return (STAGES.index(stage) if stage in STAGES else len(STAGES), stage, device_model)
+
+def escape_label(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+@contextmanager
+def measure(stage: str, device_model=''):
+    """Records duration of the block and growth of peak memory during it.
+
+    Memory is measured by tracemalloc when it's tracing (PYTHONTRACEMALLOC=1),
+    otherwise by peak RSS, which grows only when a stage needs more than before.
+    """
+
+    tracing = tracemalloc.is_tracing()
+    if tracing:
+        tracemalloc.reset_peak()
+    memory_start = tracemalloc.get_traced_memory()[0] if tracing else get_peak_rss()
+    timer_start = timer()
+    try:
+        yield
+    finally:
+        seconds = timer() - timer_start
+        if tracing:
+            memory_growth = max(tracemalloc.get_traced_memory()[1] - memory_start, 0)
+        else:
+            memory_growth = get_peak_rss() - memory_start
+        Metrics.record(stage, seconds, device_model, memory_growth)
+
+@contextmanager
+def collect_timings():
+    """Collects timings of every stage measured in the block, also in threads started by asyncio.to_thread"""
+
+    timings = []
+    token = request_timings.set(timings)
+    try:
+        yield timings
+    finally:
+        request_timings.reset(token)
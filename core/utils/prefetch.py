@@ -0,0 +1,133 @@
+import logging
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from time import time
+from django.conf import settings
+from django.db import close_old_connections
+
+logger = logging.getLogger(__name__)
+
+class PrefetchScheduler:
+    """Keeps projects of recently viewed devices warm in the project cache.
+
+    Every viewed device is revalidated a bit before its cache entry expires,
+    and re-fetched and re-parsed if it was updated in STAR, as long as somebody
+    has viewed it recently, so a page refresh gets an already parsed project.
+    """
+
+    CONFIG = settings.STAR_PREFETCH
+
+    def __init__(self):
+        self.__lock = threading.Lock()
+        self.__devices = {}
+        self.__queued = set()
+        self.__wake_up = threading.Event()
+        self.__thread = None
+        self.__executor = None
+
+    def start(self):
+        """Starts the scheduler thread once per process, touch() starts it on the first view"""
+
+        with self.__lock:
+            if self.__thread is not None:
+                return
+            self.__executor = ThreadPoolExecutor(max_workers=self.CONFIG['MAX_WORKERS'],
+                                                 thread_name_prefix='star-prefetch')
+            self.__thread = threading.Thread(target=self.__run, name='star-prefetch-scheduler', daemon=True)
+            self.__thread.start()
+
+    def touch(self, device_model: str):
+        """Marks device as viewed right after its project has been loaded.
+
+        The scheduler is started here rather than when apps are ready, so
+        management commands, tests and the autoreloader's parent process,
+        which serve no views, don't run it.
+        """
+
+        now = time()
+        with self.__lock:
+            device = self.__devices.get(device_model)
+            if device is None:
+                device = self.__devices[device_model] = {'last_refresh': None,
+                                                         'next_refresh': self.__get_next_refresh(device_model, now)}
+            device['last_viewed'] = now
+            is_started = self.__thread is not None
+
+        if not is_started and self.CONFIG['ENABLED']:
+            self.start()
+
+    def get_status(self) -> dict:
+        """Returns queue depth and refresh ages in seconds of every tracked device"""
+
+        now = time()
+        with self.__lock:
+            return {
+                'queue_depth': len(self.__queued),
+                'devices': {
+                    device_model: {
+                        'last_viewed_age': round(now - device['last_viewed']),
+                        'last_refresh_age': None if device['last_refresh'] is None
+                                            else round(now - device['last_refresh']),
+                        'next_refresh_in': round(device['next_refresh'] - now),
+                        'queued': device_model in self.__queued,
+                    }
+                    for device_model, device in self.__devices.items()
+                }
+            }
+
+    def __get_next_refresh(self, device_model: str, refreshed_at: float) -> float:
+        # Imported here, the star module can't be imported while apps are loading
+        from core.utils.star import ProjectCache
+
+        ttl = ProjectCache.get_ttl(device_model)
+        jitter = random.uniform(-self.CONFIG['JITTER'], self.CONFIG['JITTER'])
+        return refreshed_at + ttl * (self.CONFIG['REFRESH_BEFORE'] + jitter)
+
+    def __run(self):
+        while True:
+            self.__wake_up.wait(self.CONFIG['INTERVAL'])
+            self.__wake_up.clear()
+            for device_model in self.__pop_due_devices():
+                self.__executor.submit(self.__refresh, device_model)
+
+    def __pop_due_devices(self) -> list:
+        """Returns devices which projects have to be refreshed and forgets devices nobody views"""
+
+        now = time()
+        due_devices = []
+        with self.__lock:
+            for device_model, device in list(self.__devices.items()):
+                if now - device['last_viewed'] > self.CONFIG['KEEP_WARM_FOR']:
+                    if device_model not in self.__queued:
+                        del self.__devices[device_model]
+                elif device['next_refresh'] <= now and device_model not in self.__queued:
+                    self.__queued.add(device_model)
+                    due_devices.append(device_model)
+        return due_devices
+
+    def __refresh(self, device_model: str):
+        from core.utils.star import Project
+
+        is_refreshed = False
+        # The refresh may store the project, connections of a prefetch thread are closed like a request's
+        close_old_connections()
+        try:
+            Project.load_snapshot(device_model, settings.STAR_STREAMING_PARSE, revalidate=True)
+            is_refreshed = True
+        except Exception as error:
+            logger.warning('The project %s has not been prefetched: %r', device_model, error)
+        finally:
+            close_old_connections()
+            with self.__lock:
+                self.__queued.discard(device_model)
+                device = self.__devices.get(device_model)
+                if device is not None:
+                    now = time()
+                    if is_refreshed:
+                        device['last_refresh'] = now
+                        device['next_refresh'] = self.__get_next_refresh(device_model, now)
+                    else:
+                        device['next_refresh'] = now + self.CONFIG['INTERVAL']
+
+prefetch_scheduler = PrefetchScheduler()
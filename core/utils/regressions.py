@@ -0,0 +1,113 @@
+from array import array
+from dataclasses import dataclass
+from typing import Iterable, Optional
+
+
+# Results have the same codes in every project, None is always 0
+RESULT_VALUES = (None, 'Pass', 'Fail', 'Block', 'NS', 'NIS', 'NT')
+PASS, FAIL = RESULT_VALUES.index('Pass'), RESULT_VALUES.index('Fail')
+
+# Results which mean the test case hasn't been run on the binary
+NOT_RUN_VALUES = (None, 'NT')
+
+PASS_TO_FAIL = bytes((PASS, FAIL))
+FAIL_TO_PASS = bytes((FAIL, PASS))
+
+@dataclass(slots=True)
+class ResultMatrix:
+    """Results of every test case for every binary, as one byte code per result.
+
+    Codes are stored row by row, so the results of a test case across the
+    binaries are one slice of the array, and a whole row is checked by bytes
+    operations instead of a Python loop over the binaries.
+    """
+
+    binaries: list
+    values: list
+    codes: array
+
+    @property
+    def size(self) -> int:
+        return self.codes.itemsize * len(self.codes)
+
+    @classmethod
+    def from_rows(cls, binaries: list, rows: Iterable[tuple]) -> 'ResultMatrix':
+        """Encodes results of every row, a row has a result for every binary in order"""
+
+        values = list(RESULT_VALUES)
+        codes_by_value = {value: code for code, value in enumerate(values)}
+        get_code = codes_by_value.__getitem__
+        codes = array('B')
+        for results in rows:
+            try:
+                codes.frombytes(bytes(map(get_code, results)))
+            except KeyError:
+                # A result which is not in RESULT_VALUES gets the next code of the project
+                for value in results:
+                    if value not in codes_by_value:
+                        codes_by_value[value] = len(values)
+                        values.append(value)
+                codes.frombytes(bytes(map(get_code, results)))
+        return cls(list(binaries), values, codes)
+
+    def get_columns(self, first: Optional[str] = None, last: Optional[str] = None) -> range:
+        """Returns columns of binaries from the first to the last one, both included.
+
+        Raises ValueError when a binary is not in the project.
+        """
+
+        start = self.binaries.index(first) if first else 0
+        stop = self.binaries.index(last) + 1 if last else len(self.binaries)
+        if start >= stop:
+            raise ValueError(f'{first} is not older than {last}')
+        return range(start, stop)
+
+    def get_results(self, row: int, columns: range) -> list:
+        offset = row * len(self.binaries)
+        return [self.values[code] for code in self.codes[offset + columns.start:offset + columns.stop]]
+
+    def compare(self, rows: Iterable[int], columns: range) -> dict:
+        """Finds regressions, flaky and never run test cases among the rows.
+
+        Binaries without a result or with NT are skipped, so a regression is
+        a Pass followed by a Fail on the next binary where the test case has
+        been run. A test case is flaky when it goes between Pass and Fail more
+        than once. Returns {'regressions': [(row, from, to)], 'flaky': [(row, flips)],
+        'never_run': [row]}.
+        """
+
+        width = len(self.binaries)
+        codes = self.codes.tobytes()
+        not_run = bytes(code for code, value in enumerate(self.values) if value in NOT_RUN_VALUES)
+        not_pass_or_fail = bytes(code for code in range(len(self.values)) if code not in (PASS, FAIL))
+
+        regressions = []
+        flaky = []
+        never_run = []
+        for row in rows:
+            offset = row * width
+            row_codes = codes[offset + columns.start:offset + columns.stop]
+            runs = row_codes.translate(None, not_run)
+            if not runs:
+                never_run.append(row)
+                continue
+
+            if PASS_TO_FAIL in runs:
+                regressions.extend((row, *binaries) for binaries in self.__iter_regressions(row_codes, columns))
+
+            outcomes = runs.translate(None, not_pass_or_fail)
+            flips = outcomes.count(PASS_TO_FAIL) + outcomes.count(FAIL_TO_PASS)
+            if flips > 1:
+                flaky.append((row, flips))
+
+        return {'regressions': regressions, 'flaky': flaky, 'never_run': never_run}
+
+    def __iter_regressions(self, row_codes: bytes, columns: range):
+        # Only rows with a regression are walked one result at a time to find its binaries
+        previous_code = previous_column = None
+        for column, code in zip(columns, row_codes):
+            if self.values[code] in NOT_RUN_VALUES:
+                continue
+            if previous_code == PASS and code == FAIL:
+                yield self.binaries[previous_column], self.binaries[column]
+            previous_code, previous_column = code, column
@@ -0,0 +1,161 @@
+import re
+import threading
+from array import array
+from itertools import islice
+from typing import Iterable
+from core.utils.snapshot import ProjectSnapshot, get_mask, get_masks, iter_bits
+
+
+# Columns which words are indexed
+SEARCH_COLUMNS = ('TestDescription', 'TestCriteria', 'CustomerComments', 'TPComment')
+
+# Words are letters and digits, so VoWiFi_Call is found by both VoWiFi and call
+WORD = re.compile(r'[^\W_]+')
+
+def get_words(text: str) -> set:
+    return set(WORD.findall(text.lower()))
+
+class TestCaseIndex:
+    """Inverted index of words of test cases of every indexed device.
+
+    Every word has sorted rows of every device it's found in, so a query is a
+    few dict lookups and an intersection of the shortest rows. Category,
+    priority and result filters are bitsets, like filters of a project. A
+    device is searchable as long as its project is cached, an evicted
+    project is removed from the index.
+    """
+
+    def __init__(self):
+        self.__lock = threading.Lock()
+        self.__snapshots = {}
+        self.__result_masks = {}
+        self.__words_by_device = {}
+        self.__postings = {}
+
+    def __len__(self) -> int:
+        """Returns number of indexed test cases"""
+
+        with self.__lock:
+            return sum(snapshot.total_tc for snapshot in self.__snapshots.values())
+
+    def get_devices(self) -> list:
+        with self.__lock:
+            return sorted(self.__snapshots)
+
+    def has_snapshot(self, snapshot: ProjectSnapshot) -> bool:
+        """Checks if the same download of the project is indexed, a cached snapshot is a new copy on every read"""
+
+        with self.__lock:
+            indexed = self.__snapshots.get(snapshot.device_model)
+        return indexed is not None and (indexed.etag, indexed.fetched_at) == (snapshot.etag, snapshot.fetched_at)
+
+    def add_snapshot(self, snapshot: ProjectSnapshot):
+        """Indexes the project, replacing the previous project of the device"""
+
+        rows_by_word = {}
+        words_by_text = {}
+        columns = zip(*(snapshot.text_columns[name] for name in SEARCH_COLUMNS))
+        for row, texts in enumerate(columns):
+            for text in texts:
+                if text is None:
+                    continue
+                # Equal texts are interned by the snapshot, so every text is split once
+                words = words_by_text.get(text)
+                if words is None:
+                    words = words_by_text[text] = get_words(text)
+                for word in words:
+                    rows = rows_by_word.get(word)
+                    if rows is None:
+                        rows = rows_by_word[word] = array('I')
+                    # A word of several columns of one row is indexed once
+                    if not rows or rows[-1] != row:
+                        rows.append(row)
+
+        values, codes = snapshot.coded_columns['LastVersionResult']
+        result_masks = {values[code]: mask for code, mask in get_masks(codes).items()}
+
+        device_model = snapshot.device_model
+        with self.__lock:
+            self.__remove(device_model)
+            self.__snapshots[device_model] = snapshot
+            self.__result_masks[device_model] = result_masks
+            self.__words_by_device[device_model] = tuple(rows_by_word)
+            for word, rows in rows_by_word.items():
+                self.__postings.setdefault(word, {})[device_model] = rows
+
+    def remove(self, device_model: str):
+        with self.__lock:
+            self.__remove(device_model)
+
+    def search(self, query='', device_models=None, categories=None, priority=None, results=None,
+               offset=0, limit=None) -> tuple:
+        """Finds test cases which have every word of the query, returns their number and (snapshot, row) of a window.
+
+        Test cases are in order of device and row. `device_models`,
+        `categories` and `results` are sets of values to keep, None keeps
+        everything, a blank result is None. `priority` is one of
+        PRIORITY_LEVELS. An empty query finds every test case of the filters.
+        """
+
+        words = get_words(query)
+        with self.__lock:
+            if words:
+                postings = [self.__postings.get(word, {}) for word in words]
+                postings.sort(key=len)
+                candidates = [device_model for device_model in postings[0]
+                              if all(device_model in device_postings for device_postings in postings[1:])]
+            else:
+                candidates = list(self.__snapshots)
+            if device_models is not None:
+                candidates = [device_model for device_model in candidates if device_model in device_models]
+
+            # Found test cases are counted by bitsets, only the window is turned into rows
+            total = 0
+            found = []
+            end = None if limit is None else offset + limit
+            for device_model in sorted(candidates):
+                snapshot = self.__snapshots[device_model]
+                mask = self.__get_filters_mask(snapshot, categories, priority, results)
+                if mask and words:
+                    mask &= get_mask(self.__get_rows(device_model, postings), snapshot.total_tc)
+                count = mask.bit_count()
+                if (end is None or total < end) and total + count > offset:
+                    rows = islice(iter_bits(mask), max(offset - total, 0), None if end is None else end - total)
+                    found.extend((snapshot, row) for row in rows)
+                total += count
+        return total, found
+
+    def __get_filters_mask(self, snapshot: ProjectSnapshot, categories, priority, results) -> int:
+        mask = snapshot.all_mask
+        if categories is not None:
+            categories_mask = 0
+            for category, category_mask in snapshot.masks['categories'].items():
+                if category in categories:
+                    categories_mask |= category_mask
+            mask &= categories_mask
+        if priority in snapshot.masks['priorities']:
+            mask &= snapshot.masks['priorities'][priority]
+        if results is not None:
+            results_mask = 0
+            for result, result_mask in self.__result_masks[snapshot.device_model].items():
+                if result in results:
+                    results_mask |= result_mask
+            mask &= results_mask
+        return mask
+
+    @staticmethod
+    def __get_rows(device_model: str, postings: list) -> Iterable[int]:
+        # The shortest rows are intersected with the rest
+        rows_of_words = sorted((device_postings[device_model] for device_postings in postings), key=len)
+        if len(rows_of_words) == 1:
+            return rows_of_words[0]
+        return set(rows_of_words[0]).intersection(*rows_of_words[1:])
+
+    def __remove(self, device_model: str):
+        for word in self.__words_by_device.pop(device_model, ()):
+            device_postings = self.__postings[word]
+            del device_postings[device_model]
+            if not device_postings:
+                del self.__postings[word]
+        self.__snapshots.pop(device_model, None)
+        self.__result_masks.pop(device_model, None)
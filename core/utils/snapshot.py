@@ -0,0 +1,484 @@
+import hashlib
+from collections import Counter
+from array import array
+from dataclasses import dataclass, field
+from datetime import datetime
+from time import time
+from timeit import default_timer as timer
+from typing import Iterable, Iterator, Optional
+from lxml import etree
+from core.utils.regressions import ResultMatrix
+from core.utils.spill import SpilledColumn
+
+
+NECESSARY_TC_ITEMS = (
+        'displayorder',
+        'TestDescription',
+        'TestCriteria',
+        'TestCaseName',
+        'CategoryName',
+        'Priority',
+        'usku_v2',
+        'usku_v3',
+        'mr_usku_v2',
+        'mr_usku_v3',
+        'tc911',
+        'CustomerComments',
+        'TPComment',
+        'MELDefectType',
+        'IsStep')
+
+VARIANTS = ('usku_v2', 'usku_v3', 'mr_usku_v2', 'mr_usku_v3')
+
+# Values of these columns repeat a lot, so they are stored as codes of interned values
+CODED_COLUMNS = ('CategoryName', 'Priority', 'LastVersionResult', 'PreviousVersionResult', 'issue')
+
+TEXT_COLUMNS = tuple(name for name in NECESSARY_TC_ITEMS if name not in CODED_COLUMNS)
+
+# Changes of these columns between two downloads of a project are highlighted
+DIFF_COLUMNS = ('CustomerComments', 'TPComment', 'MELDefectType', 'issue')
+
+# Columns the test cases table can be sorted by
+SORT_COLUMNS = ('displayorder', 'CategoryName', 'Priority', 'TestDescription', 'TestCriteria',
+                'LastVersionResult', 'PreviousVersionResult')
+
+XS_SEQUENCE = '{http://www.w3.org/2001/XMLSchema}sequence'
+XS_ELEMENT = '{http://www.w3.org/2001/XMLSchema}element'
+TEST_CASE_TAG = 'TestCaseResults2'
+DIFFGR_HAS_CHANGES = '{urn:schemas-microsoft-com:xml-diffgram-v1}hasChanges'
+
+PRIORITY_LEVELS = {
+    'P0': ('P0',),
+    'P1': ('P0', 'P1'),
+    'P2': ('P0', 'P1', 'P2'),
+}
+
+def parse_xml(xml) -> etree._Element:
+    """Parses xml to etree element"""
+
+    xml_parser = etree.XMLParser(recover=True, ns_clean=True, remove_blank_text=True)
+    project_etree_elm = etree.fromstring(xml, parser=xml_parser)
+    return project_etree_elm
+
+def get_list_of_binaries(head_of_table: Iterable[etree._Element]) -> list:
+    """Returns list of binaries versions from the schema header elements"""
+
+    list_of_binaries_versions = []
+    for el in head_of_table:
+        if el.attrib.get('name') not in ('mtp', 'PTN', 'sdf') and \
+            len(el.attrib.get('name')) == 3:
+                list_of_binaries_versions.append(el.attrib.get('name'))
+    return list_of_binaries_versions
+
+@dataclass(slots=True)
+class TestCaseRecord:
+    """One test case of a device project"""
+
+    testcase_int_id: str = ''
+    displayorder: Optional[str] = None
+    TestDescription: Optional[str] = None
+    TestCriteria: Optional[str] = None
+    TestCaseName: Optional[str] = None
+    CategoryName: Optional[str] = None
+    Priority: Optional[str] = None
+    usku_v2: Optional[str] = None
+    usku_v3: Optional[str] = None
+    mr_usku_v2: Optional[str] = None
+    mr_usku_v3: Optional[str] = None
+    tc911: Optional[str] = None
+    CustomerComments: Optional[str] = None
+    TPComment: Optional[str] = None
+    MELDefectType: Optional[str] = None
+    IsStep: Optional[str] = None
+    LastVersionResult: Optional[str] = None
+    PreviousVersionResult: Optional[str] = None
+    issue: Optional[str] = None
+    changes: tuple = ()
+    # Results of every binary of the project, in order of the binaries
+    results: tuple = ()
+
+    def get_issue(self) -> Optional[str]:
+        """Returns what is missing in the result of the last binary"""
+
+        if self.LastVersionResult in ('Fail', 'NS', 'Block', 'NT') and self.CustomerComments is None:
+            return 'Missing Comment'
+        elif self.LastVersionResult == 'Fail' and self.MELDefectType is None:
+            return 'Missing DefectType'
+        return None
+
+def iter_bits(mask: int) -> Iterator[int]:
+    """Yields positions of set bits of the mask in ascending order"""
+
+    bits = format(mask, 'b')[::-1]
+    position = bits.find('1')
+    while position != -1:
+        yield position
+        position = bits.find('1', position + 1)
+
+def encode_column(values: Iterable[Optional[str]]) -> tuple:
+    """Returns interned values of the column and array of their codes, None is always 0"""
+
+    interned_values = [None]
+    codes_by_value = {None: 0}
+    codes = array('H')
+    for value in values:
+        code = codes_by_value.get(value)
+        if code is None:
+            code = codes_by_value[value] = len(interned_values)
+            interned_values.append(value)
+        codes.append(code)
+    return interned_values, codes
+
+def get_masks(codes: array) -> dict:
+    """Returns bitset of rows of every code, the rows are walked once for all codes"""
+
+    rows_by_code = {}
+    for row, code in enumerate(codes):
+        rows = rows_by_code.get(code)
+        if rows is None:
+            rows = rows_by_code[code] = []
+        rows.append(row)
+
+    return {code: get_mask(rows, len(codes)) for code, rows in rows_by_code.items()}
+
+def get_mask(rows: Iterable[int], total: int) -> int:
+    """Returns bitset of the rows, built as a string of bits for one int() call"""
+
+    bits = bytearray(b'0') * total
+    for row in rows:
+        bits[row] = 49  # b'1'
+    bits.reverse()
+    return int(bits or b'0', 2)
+
+@dataclass(slots=True)
+class ProjectSnapshot:
+    """Parsed device project which doesn't depend on any filter.
+
+    Test cases are stored by columns sorted by category and display order.
+    Category, priority, results and issue are kept as small codes of interned
+    values, and every filter has a precomputed bitset of matching rows, so a
+    filter request is a few masks AND without any parsing or sorting.
+    """
+
+    device_model: str
+    list_of_binaries: list
+    total_tc: int
+    text_columns: dict
+    coded_columns: dict
+    masks: dict
+    etag: Optional[str] = None
+    fetched_at: float = field(default_factory=time)
+    last_update: Optional[datetime] = None
+    changes: dict = field(default_factory=dict)
+    results: Optional[ResultMatrix] = None
+    # Seconds spent on every stage of parsing, they are recorded by the process which asked for the parse
+    timings: dict = field(default_factory=dict)
+
+    @property
+    def current_binary_version(self) -> str:
+        return self.list_of_binaries[-1]
+
+    @property
+    def previous_binary_version(self) -> str:
+        return self.list_of_binaries[-2]
+
+    @property
+    def has_all_results(self) -> bool:
+        """Checks if results of every binary are known, a project restored from the database has the two last only"""
+
+        return self.results is not None and len(self.results.binaries) == len(self.list_of_binaries)
+
+    @property
+    def all_mask(self) -> int:
+        return (1 << self.total_tc) - 1
+
+    @property
+    def size(self) -> int:
+        """Returns approximate size of the snapshot data in bytes"""
+
+        # Spilled texts are on disk
+        texts_size = sum(len(value) for column in self.text_columns.values() if not isinstance(column, SpilledColumn)
+                         for value in column if value)
+        codes_size = sum(codes.itemsize * len(codes) + sum(len(value) for value in values if value)
+                         for values, codes in self.coded_columns.values())
+        results_size = self.results.size if self.results is not None else 0
+        return texts_size + codes_size + results_size
+
+    def get_test_case(self, row: int) -> TestCaseRecord:
+        """Returns the test case stored in the row"""
+
+        test_case = {name: column[row] for name, column in self.text_columns.items()}
+        for name, (values, codes) in self.coded_columns.items():
+            test_case[name] = values[codes[row]]
+        return TestCaseRecord(testcase_int_id='testcase_int_id-' + str(row + 1),
+                              changes=self.changes.get(row, ()),
+                              **test_case)
+
+    def get_value(self, name: str, row: int) -> Optional[str]:
+        """Returns value of one column in the row"""
+
+        if name in self.text_columns:
+            return self.text_columns[name][row]
+        values, codes = self.coded_columns[name]
+        return values[codes[row]]
+
+    def get_values(self, name: str, rows=None) -> list:
+        """Returns values of one column in the rows, in every row if rows is None.
+
+        Spilled texts are read by a few queries instead of one per row.
+        """
+
+        if name in self.text_columns:
+            column = self.text_columns[name]
+            if isinstance(column, SpilledColumn):
+                return column.get_values(rows)
+            return list(column) if rows is None else [column[row] for row in rows]
+        values, codes = self.coded_columns[name]
+        return [values[code] for code in (codes if rows is None else (codes[row] for row in rows))]
+
+    def get_result(self, binary_version: str, row: int) -> Optional[str]:
+        """Returns result of the row for one of two last binaries"""
+
+        if binary_version == self.current_binary_version:
+            return self.get_value('LastVersionResult', row)
+        return self.get_value('PreviousVersionResult', row)
+
+    def get_key(self, row: int) -> tuple:
+        """Returns what identifies the test case between downloads of the project"""
+
+        return (self.get_value('CategoryName', row),
+                self.get_value('displayorder', row),
+                self.get_value('TestCaseName', row))
+
+    def compare_with(self, previous: 'ProjectSnapshot'):
+        """Finds test cases which results or comments differ from the previous snapshot.
+
+        Results are compared by binary version, so a new binary shows only the
+        test cases which already have results for it.
+        """
+
+        previous_rows = {previous.get_key(row): row for row in range(previous.total_tc)}
+        binaries = (self.previous_binary_version, self.current_binary_version)
+        # Whole columns are read at once, spilled comments would be a query per row
+        values = {name: self.get_values(name) for name in DIFF_COLUMNS}
+        previous_values = {name: previous.get_values(name) for name in DIFF_COLUMNS}
+
+        changes = {}
+        for row in range(self.total_tc):
+            previous_row = previous_rows.get(self.get_key(row))
+            if previous_row is None:
+                changes[row] = ('new',)
+                continue
+
+            changed_columns = []
+            for binary_version in binaries:
+                result = self.get_result(binary_version, row)
+                if binary_version in previous.list_of_binaries[-2:]:
+                    previous_result = previous.get_result(binary_version, previous_row)
+                else:
+                    previous_result = None
+                if result != previous_result:
+                    changed_columns.append(binary_version)
+            for name in DIFF_COLUMNS:
+                if values[name][row] != previous_values[name][previous_row]:
+                    changed_columns.append(name)
+
+            if changed_columns:
+                changes[row] = tuple(changed_columns)
+
+        self.changes = changes
+
+    def get_summary(self) -> dict:
+        """Returns counts of results of the last binary and of issues, for the project and per category.
+
+        Counted over pairs of codes in one pass, no test case record is built.
+        """
+
+        categories, category_codes = self.coded_columns['CategoryName']
+        results, result_codes = self.coded_columns['LastVersionResult']
+        issues, issue_codes = self.coded_columns['issue']
+
+        result_counts = Counter(zip(category_codes, result_codes))
+        issue_counts = Counter(zip(category_codes, issue_codes))
+
+        def get_empty_counts() -> dict:
+            return {'total': 0, 'results': {}, 'issues': {}}
+
+        summary = get_empty_counts()
+        by_category = {}
+        for (category_code, result_code), count in result_counts.items():
+            result = results[result_code] or 'Blank'
+            for counts in (summary, by_category.setdefault(categories[category_code] or '', get_empty_counts())):
+                counts['total'] += count
+                counts['results'][result] = counts['results'].get(result, 0) + count
+        for (category_code, issue_code), count in issue_counts.items():
+            if issue_code == 0:
+                continue
+            issue = issues[issue_code]
+            for counts in (summary, by_category[categories[category_code] or '']):
+                counts['issues'][issue] = counts['issues'].get(issue, 0) + count
+
+        summary['categories'] = dict(sorted(by_category.items()))
+        return summary
+
+    def iter_test_cases(self) -> Iterator[TestCaseRecord]:
+        for row in range(self.total_tc):
+            yield self.get_test_case(row)
+
+    @classmethod
+    def from_test_case_elements(cls, device_model: str, list_of_binaries: list,
+                                raw_list_of_tc: Iterable[etree._Element], etag=None) -> 'ProjectSnapshot':
+        """Builds a snapshot from TestCaseResults2 elements"""
+
+        # Record field of every tag the project has, other tags are skipped by one lookup,
+        # a binary tag gives position of the result instead of a field
+        fields_by_tag = {name: name for name in NECESSARY_TC_ITEMS}
+        fields_by_tag.update((binary, position) for position, binary in enumerate(list_of_binaries))
+        get_field = fields_by_tag.get
+
+        test_cases = []
+        for tc in raw_list_of_tc:
+
+            test_case = {}
+            results = [None] * len(list_of_binaries)
+            for el in tc:
+                name = get_field(el.tag)
+                if name is not None:
+                    text = el.text
+                    if text is not None:
+                        if name.__class__ is int:
+                            results[name] = text
+                        else:
+                            test_case[name] = text
+
+            test_case = TestCaseRecord(PreviousVersionResult=results[-2], LastVersionResult=results[-1],
+                                       results=tuple(results), **test_case)
+            test_case.issue = test_case.get_issue()
+            test_cases.append(test_case)
+
+        return cls.from_test_cases(device_model, list_of_binaries, test_cases, etag)
+
+    @classmethod
+    def from_test_cases(cls, device_model: str, list_of_binaries: list,
+                        test_cases: list, etag=None) -> 'ProjectSnapshot':
+        """Builds columns and filter masks from test case records"""
+
+        test_cases = sorted(test_cases, key=lambda tc: (tc.CategoryName or '', tc.displayorder or ''))
+
+        # Equal texts (flags, repeated comments) share one string object
+        interned_texts = {}
+        text_columns = {name: [interned_texts.setdefault(getattr(tc, name), getattr(tc, name))
+                               for tc in test_cases]
+                        for name in TEXT_COLUMNS}
+        coded_columns = {name: encode_column(getattr(tc, name) for tc in test_cases)
+                         for name in CODED_COLUMNS}
+
+        code_masks = {name: get_masks(codes) for name, (_, codes) in coded_columns.items()}
+
+        def get_coded_mask(name: str, accepted_values) -> int:
+            values, _ = coded_columns[name]
+            mask = 0
+            for code, value in enumerate(values):
+                if value in accepted_values:
+                    mask |= code_masks[name].get(code, 0)
+            return mask
+
+        def get_text_mask(name: str) -> int:
+            return get_masks(array('B', (value is not None for value in text_columns[name]))).get(1, 0)
+
+        categories, _ = coded_columns['CategoryName']
+        masks = {
+            'categories': {category: get_coded_mask('CategoryName', (category,)) for category in categories},
+            'priorities': {priority: get_coded_mask('Priority', accepted_priorities)
+                           for priority, accepted_priorities in PRIORITY_LEVELS.items()},
+            'variants': {variant: get_text_mask(variant) for variant in VARIANTS},
+            'tc911': get_text_mask('tc911'),
+            'issue': get_coded_mask('issue', set(coded_columns['issue'][0]) - {None}),
+            'blank': get_coded_mask('LastVersionResult', (None,)),
+        }
+
+        # Records saved in the database have results of the two last binaries only, see has_all_results
+        if all(len(tc.results) == len(list_of_binaries) for tc in test_cases):
+            results = ResultMatrix.from_rows(list_of_binaries, (tc.results for tc in test_cases))
+        else:
+            results = ResultMatrix.from_rows(list_of_binaries[-2:], ((tc.PreviousVersionResult, tc.LastVersionResult)
+                                                                     for tc in test_cases))
+
+        return cls(device_model, list_of_binaries, len(test_cases), text_columns, coded_columns, masks, etag,
+                   results=results)
+
+def filter_rows(snapshot: ProjectSnapshot, filters: dict, categories=None) -> list:
+    """Returns rows of the snapshot which match the filters.
+
+    `categories` is a set of categories titles to keep, all
+    categories are kept when it's None.
+    """
+
+    return list(iter_bits(get_filter_mask(snapshot, filters, categories)))
+
+def get_filter_mask(snapshot: ProjectSnapshot, filters: dict, categories=None) -> int:
+    """Returns bitset of rows of the snapshot which match the filters, as filter_rows()"""
+
+    masks = snapshot.masks
+    mask = snapshot.all_mask
+
+    if categories is not None:
+        # Test cases without category are never filtered out by categories,
+        # every category of the project is looked up once whatever is selected
+        categories_mask = 0
+        for category, category_mask in masks['categories'].items():
+            if category is None or category in categories:
+                categories_mask |= category_mask
+        mask &= categories_mask
+
+    if filters.get('Priority') in masks['priorities']:
+        mask &= masks['priorities'][filters['Priority']]
+
+    if 'Variant' in filters:
+        mask &= masks['variants'].get(filters['Variant'], 0)
+
+    if 'tc911' not in filters:
+        mask &= ~masks['tc911']
+
+    if 'only_blank' in filters:
+        mask &= masks['blank'] | masks['issue']
+
+    return mask
+
+def sort_rows(snapshot: ProjectSnapshot, rows: list, sort_key: str) -> list:
+    """Returns rows sorted by one of SORT_COLUMNS, descending if the key starts with '-'.
+
+    Rows are already in order of category and display order, so the sort
+    is stable against it and empty values go first.
+    """
+
+    name = sort_key.lstrip('-')
+    if name not in SORT_COLUMNS:
+        return rows
+    values = dict(zip(rows, snapshot.get_values(name, rows)))
+    return sorted(rows, key=lambda row: values[row] or '', reverse=sort_key.startswith('-'))
+
+def parse_project(device_model: str, raw_project: bytes) -> ProjectSnapshot:
+    """Parses a whole GetTestCaseResults2_AVT response to a snapshot"""
+
+    timer_start = timer()
+    project_etree = parse_xml(raw_project)
+    parse_time = timer() - timer_start
+
+    # The schema comes before the diffgram, so the binaries are known before the first test case
+    elements = project_etree.iter(XS_SEQUENCE, TEST_CASE_TAG)
+    list_of_binaries = []
+    for el in elements:
+        if el.tag == XS_SEQUENCE:
+            list_of_binaries = get_list_of_binaries(el.iterchildren(XS_ELEMENT))
+            break
+
+    raw_list_of_tc = (el for el in elements
+                      if el.tag == TEST_CASE_TAG and el.get(DIFFGR_HAS_CHANGES) == 'modified')
+
+    snapshot = ProjectSnapshot.from_test_case_elements(device_model,
+                                                       list_of_binaries,
+                                                       raw_list_of_tc,
+                                                       hashlib.sha1(raw_project).hexdigest())
+    snapshot.timings = {'xml_parse': parse_time, 'record_build': timer() - timer_start - parse_time}
+    return snapshot
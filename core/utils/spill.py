@@ -0,0 +1,129 @@
+import atexit
+import logging
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+from collections import deque
+from uuid import uuid4
+
+logger = logging.getLogger(__name__)
+
+# Long texts of test cases, they are most of the size of a project
+SPILLED_COLUMNS = ('TestDescription', 'TestCriteria', 'CustomerComments', 'TPComment')
+
+# Rows of one query, SQLite limits the number of its parameters
+BATCH_SIZE = 500
+
+# Connections are opened once per thread, SQLite connections can't be shared between threads
+connections = threading.local()
+
+def get_connection(path: str) -> sqlite3.Connection:
+    opened = connections.__dict__.setdefault('opened', {})
+    connection = opened.get(path)
+    if connection is None:
+        # Files of old snapshots are removed by the thread which spills, their connections are closed here
+        for removed_path in [opened_path for opened_path in opened if not os.path.exists(opened_path)]:
+            opened.pop(removed_path).close()
+        connection = opened[path] = sqlite3.connect(f'file:{path}?mode=ro', uri=True)
+    return connection
+
+class SpilledColumn:
+    """Text column of a snapshot stored in a SQLite file, rows are read on demand.
+
+    It's read like a list of texts, and pickled as the path of the file,
+    so a pickled snapshot doesn't bring the texts back to memory.
+    """
+
+    def __init__(self, path: str, name: str, length: int):
+        self.path = path
+        self.name = name
+        self.length = length
+
+    def __len__(self) -> int:
+        return self.length
+
+    def __getitem__(self, row: int):
+        if not 0 <= row < self.length:
+            raise IndexError('row is out of the column')
+        value = get_connection(self.path).execute('SELECT value FROM texts WHERE name = ? AND row = ?',
+                                                  (self.name, row)).fetchone()
+        return None if value is None else value[0]
+
+    def get_values(self, rows=None) -> list:
+        """Returns texts of the rows, of every row if rows is None, by one query per BATCH_SIZE rows"""
+
+        if rows is None:
+            return list(self)
+        connection = get_connection(self.path)
+        values = {}
+        for start in range(0, len(rows), BATCH_SIZE):
+            batch = rows[start:start + BATCH_SIZE]
+            values.update(connection.execute(f'SELECT row, value FROM texts WHERE name = ? AND row IN '
+                                             f'({", ".join("?" * len(batch))}) ORDER BY row',
+                                             (self.name, *batch)))
+        return [values.get(row) for row in rows]
+
+    def __iter__(self):
+        cursor = get_connection(self.path).execute('SELECT row, value FROM texts WHERE name = ? ORDER BY row',
+                                                   (self.name,))
+        # Rows without text are not stored
+        next_row = 0
+        for row, value in cursor:
+            for _ in range(row - next_row):
+                yield None
+            yield value
+            next_row = row + 1
+        for _ in range(self.length - next_row):
+            yield None
+
+class SpillDirectory:
+    """Temporary directory of SQLite files with long texts of projects which are over the memory budget.
+
+    The last `keep` files of every device are kept, older snapshots may
+    still be used by a request or compared with a new one. The directory
+    is removed when the process exits.
+    """
+
+    def __init__(self, keep=3, parent=None):
+        self.keep = keep
+        self.parent = parent
+        self.__path = None
+        self.__lock = threading.Lock()
+        self.__files = {}
+
+    @property
+    def path(self) -> str:
+        with self.__lock:
+            if self.__path is None:
+                self.__path = tempfile.mkdtemp(prefix='starlight-spill-', dir=self.parent)
+                atexit.register(shutil.rmtree, self.__path, ignore_errors=True)
+            return self.__path
+
+    def spill(self, snapshot):
+        """Moves long texts of the snapshot to a new SQLite file"""
+
+        path = os.path.join(self.path, f'{uuid4().hex}.sqlite3')
+        connection = sqlite3.connect(path)
+        try:
+            with connection:
+                connection.execute('CREATE TABLE texts (name TEXT, row INTEGER, value TEXT, PRIMARY KEY (name, row))'
+                                   ' WITHOUT ROWID')
+                for name in SPILLED_COLUMNS:
+                    connection.executemany('INSERT INTO texts VALUES (?, ?, ?)',
+                                           ((name, row, value) for row, value in enumerate(snapshot.text_columns[name])
+                                            if value is not None))
+        finally:
+            connection.close()
+
+        for name in SPILLED_COLUMNS:
+            snapshot.text_columns[name] = SpilledColumn(path, name, snapshot.total_tc)
+        logger.info('Texts of the project %s have been spilled to %s', snapshot.device_model, path)
+
+        with self.__lock:
+            files = self.__files.setdefault(snapshot.device_model, deque())
+            files.append(path)
+            old_files = [files.popleft() for _ in range(len(files) - self.keep)]
+        for old_path in old_files:
+            os.remove(old_path)
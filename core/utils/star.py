@@ -1,20 +1,43 @@
 import requests
+import asyncio
 import base64
+import copy
+import hashlib
+import threading
+import logging
+import multiprocessing
+import os
 import zlib
+from collections import OrderedDict
+from functools import cached_property, partial
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from asgiref.sync import sync_to_async
 from django.conf import settings
 from datetime import timedelta
 from django.utils.dateparse import parse_datetime
 from lxml import etree
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from typing import Callable, Iterable, Iterator
+from time import time
+from tempfile import SpooledTemporaryFile
 from timeit import default_timer as timer
-from core.models import Category
+from core.utils.archive import RawArchive
+from core.utils.listing import ProjectIndex
+from core.utils.live import LiveUpdates
+from core.utils.metadata import MetadataCache
+from core.utils.metrics import Metrics, measure
+from core.utils.search import TestCaseIndex
+from core.utils.spill import SpillDirectory
+from core.utils.store import SnapshotStore, to_aware
+from core.utils.snapshot import (DIFFGR_HAS_CHANGES, NECESSARY_TC_ITEMS, TEST_CASE_TAG, XS_ELEMENT, XS_SEQUENCE,
+                                 ProjectSnapshot, filter_rows, get_list_of_binaries, parse_project, parse_xml)
 
 
-def parse_xml(xml) -> etree._Element:
-    """Parses xml to etree element"""
+logger = logging.getLogger(__name__)
 
-    xml_parser = etree.XMLParser(recover=True, ns_clean=True, remove_blank_text=True)
-    project_etree_elm = etree.fromstring(xml, parser=xml_parser)
-    return project_etree_elm
+# Parse processes are spawned, a fork of the web process with running threads could deadlock
+PARSE_CONTEXT = multiprocessing.get_context('spawn')
 
 def decompress_gzip_string(compressed_data: str) -> str:
     """Decompresses a gzip string"""
@@ -25,6 +48,145 @@ def decompress_gzip_string(compressed_data: str) -> str:
 
     return decompressed_string
 
+GZIP_MAGIC = b'\x1f\x8b'
+BASE64_GZIP_MAGIC = b'H4sI'
+# A packed result is the only text of the result element right after the envelope
+PACKED_PAYLOAD_SCAN = 4096
+
+def find_packed_string(content: bytes) -> int:
+    """Returns where a base64 gzip string starts in the beginning of the response, -1 if there is none"""
+
+    start = content.find(BASE64_GZIP_MAGIC, 0, PACKED_PAYLOAD_SCAN)
+    return start if start > 0 and content[start - 1:start] == b'>' else -1
+
+def is_packed_payload(head: bytes) -> bool:
+    """Checks if the beginning of the response is gzip or carries a base64 gzip string"""
+
+    return head[:2] == GZIP_MAGIC or find_packed_string(head) != -1
+
+def unpack_payload(content: bytes) -> bytes:
+    """Returns xml of the response which could be gzipped or carry a base64 gzip string"""
+
+    if content[:2] == GZIP_MAGIC:
+        return zlib.decompress(content, 16 + zlib.MAX_WBITS)
+
+    start = find_packed_string(content)
+    if start != -1:
+        end = content.index(b'<', start)
+        return decompress_gzip_string(content[start:end].decode('ascii')).encode('utf-8')
+
+    return content
+
+def spool_chunks(chunks: Iterable[bytes], max_size: int) -> tuple:
+    """Returns a file with all chunks and their SHA-1, the file is moved from memory to disk above max_size"""
+
+    raw_file = SpooledTemporaryFile(max_size=max_size)
+    digest = hashlib.sha1()
+    try:
+        for chunk in chunks:
+            digest.update(chunk)
+            raw_file.write(chunk)
+    except BaseException:
+        raw_file.close()
+        raise
+    raw_file.seek(0)
+    return raw_file, digest.hexdigest()
+
+def create_session(config: dict) -> requests.Session:
+    """Returns keep-alive session with connection pool and retries for transient failures"""
+
+    retry = Retry(total=config['RETRIES'],
+                  # A read timeout is not retried, so a stalled STAR holds a thread for one READ_TIMEOUT
+                  read=0,
+                  backoff_factor=config['BACKOFF_FACTOR'],
+                  status_forcelist=(502, 503, 504),
+                  # STAR SOAP calls only read data, so it is safe to repeat them
+                  allowed_methods=frozenset({'POST'}),
+                  raise_on_status=False)
+    adapter = HTTPAdapter(pool_connections=config['POOL_SIZE'],
+                          pool_maxsize=config['POOL_SIZE'],
+                          max_retries=retry)
+
+    session = requests.Session()
+    session.headers['Accept-Encoding'] = 'gzip, deflate'
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+class ProjectStreamParser:
+    """Parses GetTestCaseResults2_AVT response chunk by chunk.
+
+    The binaries versions are read from the schema header as soon as it
+    arrives, then every modified TestCaseResults2 element is yielded and
+    cleared right after use, so only one test case is kept in memory.
+    """
+
+    XS_SEQUENCE = XS_SEQUENCE
+    XS_ELEMENT = XS_ELEMENT
+    TEST_CASE_TAG = TEST_CASE_TAG
+    DIFFGR_HAS_CHANGES = DIFFGR_HAS_CHANGES
+
+    def __init__(self, chunks: Iterable[bytes]):
+        self.__chunks = iter(chunks)
+        self.__hash = hashlib.sha1()
+        # Seconds spent on reading the response, and on parsing it alone
+        self.read_time = 0.0
+        self.parse_time = 0.0
+        self.__parser = etree.XMLPullParser(events=('end',),
+                                            tag=(self.XS_SEQUENCE, self.TEST_CASE_TAG),
+                                            recover=True,
+                                            remove_blank_text=True)
+        self.list_of_binaries = self.__read_list_of_binaries()
+
+    def __read_list_of_binaries(self) -> list:
+        """Feeds chunks until the first schema sequence is parsed"""
+
+        for chunk in self.__read_chunks():
+            for _, el in self.__parser.read_events():
+                if el.tag == self.XS_SEQUENCE:
+                    return get_list_of_binaries(el.iterchildren(self.XS_ELEMENT))
+        return []
+
+    def iter_test_cases(self) -> Iterator[etree._Element]:
+        """Yields modified test case elements while the response is downloading"""
+
+        yield from self.__read_test_cases()
+        for chunk in self.__read_chunks():
+            yield from self.__read_test_cases()
+        self.__parser.close()
+
+    @property
+    def etag(self) -> str:
+        """Returns hash of the response fed so far"""
+
+        return self.__hash.hexdigest()
+
+    def __read_chunks(self) -> Iterator[bytes]:
+        """Yields chunks after they are fed to the parser"""
+
+        while True:
+            timer_start = timer()
+            chunk = next(self.__chunks, None)
+            if chunk is None:
+                self.read_time += timer() - timer_start
+                return
+            parse_start = timer()
+            self.__hash.update(chunk)
+            self.__parser.feed(chunk)
+            self.parse_time += timer() - parse_start
+            self.read_time += timer() - timer_start
+            yield chunk
+
+    def __read_test_cases(self) -> Iterator[etree._Element]:
+        for _, el in self.__parser.read_events():
+            if el.tag != self.TEST_CASE_TAG:
+                continue
+            if el.get(self.DIFFGR_HAS_CHANGES) == 'modified':
+                yield el
+            el.clear(keep_tail=True)
+            while el.getprevious() is not None:
+                del el.getparent()[0]
+
 class Star:
 
     STAR = settings.ENV['STAR']
@@ -41,7 +203,12 @@ class Star:
             'SOAPAction': STAR['SOAP_ACTION']
         }
     SID = STAR['SID']
-    ALL_ACTIVE_CATEGORIES = list(Category.objects.filter(is_active=True).values('id', 'title'))
+    TABLES_XPATH = etree.XPath('//Table')
+    STREAM_CHUNK_SIZE = 64 * 1024
+
+    HTTP = settings.STAR_HTTP
+    TIMEOUT = (HTTP['CONNECT_TIMEOUT'], HTTP['READ_TIMEOUT'])
+    session = create_session(HTTP)
 
     @classmethod
     def get_projects(cls) -> list:
@@ -58,12 +225,14 @@ class Star:
                                         </soap:Body>\
                                             </soap:Envelope>'
 
-        response = requests.post(cls.STAR_URL,
-                                 data=soap_request_body,
-                                 headers=cls.HEADERS_GETDEVICES)
+        response = cls.session.post(cls.STAR_URL,
+                                    data=soap_request_body,
+                                    headers=cls.HEADERS_GETDEVICES,
+                                    timeout=cls.TIMEOUT)
+        response.raise_for_status()
 
-        etree_projects = parse_xml(response.content)
-        tables_of_projects = etree_projects.xpath('//Table')
+        etree_projects = parse_xml(unpack_payload(response.content))
+        tables_of_projects = cls.TABLES_XPATH(etree_projects)
         
         projetcs_list = []
 
@@ -80,11 +249,14 @@ class Star:
         return projetcs_list
     
     @classmethod
-    def get_device_project(cls, device_model: str) -> bytes:
-        """Returns a whole project for requested device"""
+    async def aget_projects(cls) -> list:
+        """Returns list of all projects without blocking the event loop"""
 
-        timer_start = timer()
-        soap_request_body = f'<?xml version="1.0" encoding="utf-8"?> \
+        return await asyncio.to_thread(cls.get_projects)
+
+    @classmethod
+    def __get_device_project_request_body(cls, device_model: str) -> str:
+        return f'<?xml version="1.0" encoding="utf-8"?> \
             <soap:Envelope xmlns:soap="http://schemas.xmlsoap.org/soap/envelope/" \
                 xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance" xmlns:xsd="http://www.w3.org/2001/XMLSchema">\
                 <soap:Body>\
@@ -96,143 +268,545 @@ class Star:
                 </soap:Body>\
             </soap:Envelope>'
 
-        response = requests.post(cls.STAR_URL,
-                                 data=soap_request_body,
-                                 headers=cls.HEADERS_GET_TEST_CASE_RESULT2)
+    @classmethod
+    def get_device_project(cls, device_model: str) -> bytes:
+        """Returns a whole project for requested device"""
+
+        with measure('request_build', device_model):
+            soap_request_body = cls.__get_device_project_request_body(device_model)
+
+        timer_start = timer()
+        response = cls.session.post(cls.STAR_URL,
+                                    data=soap_request_body,
+                                    headers=cls.HEADERS_GET_TEST_CASE_RESULT2,
+                                    timeout=cls.TIMEOUT)
+        response.raise_for_status()
+
+        download_time = timer() - timer_start
+        Metrics.record('ttfb', response.elapsed.total_seconds(), device_model)
+        Metrics.record('transfer', download_time - response.elapsed.total_seconds(), device_model)
+        Metrics.count_bytes(device_model, len(response.content))
+
+        logger.info('The project %s has been downloaded in %.2f seconds.', device_model, download_time)
+
+        return unpack_payload(response.content)
+
+    @classmethod
+    async def aget_device_project(cls, device_model: str) -> bytes:
+        """Returns a whole project for requested device without blocking the event loop"""
+
+        return await asyncio.to_thread(cls.get_device_project, device_model)
+
+    @classmethod
+    def iter_device_project(cls, device_model: str) -> Iterator[bytes]:
+        """Yields a project for requested device chunk by chunk while it is downloading"""
+
+        with measure('request_build', device_model):
+            soap_request_body = cls.__get_device_project_request_body(device_model)
+
+        timer_start = timer()
+        with cls.session.post(cls.STAR_URL,
+                              data=soap_request_body,
+                              headers=cls.HEADERS_GET_TEST_CASE_RESULT2,
+                              timeout=cls.TIMEOUT,
+                              stream=True) as response:
+            response.raise_for_status()
+            Metrics.record('ttfb', response.elapsed.total_seconds(), device_model)
+            chunks = cls.__count_chunks(response.iter_content(chunk_size=cls.STREAM_CHUNK_SIZE), device_model)
+            # The marker of a packed payload is looked for in the same head whatever size chunks come in
+            head = b''
+            for chunk in chunks:
+                head += chunk
+                if len(head) >= PACKED_PAYLOAD_SCAN:
+                    break
+            if is_packed_payload(head):
+                # A packed payload can't be parsed before it's unpacked as a whole
+                yield unpack_payload(head + b''.join(chunks))
+            else:
+                yield head
+                yield from chunks
+
+        logger.info('The project %s has been downloaded in %.2f seconds.', device_model, timer() - timer_start)
+
+    @staticmethod
+    def __count_chunks(chunks: Iterator[bytes], device_model: str) -> Iterator[bytes]:
+        """Yields chunks and records time spent on waiting for them and their size"""
+
+        transfer_time = 0.0
+        size = 0
+        try:
+            while True:
+                timer_start = timer()
+                chunk = next(chunks, None)
+                transfer_time += timer() - timer_start
+                if chunk is None:
+                    return
+                size += len(chunk)
+                yield chunk
+        finally:
+            Metrics.record('transfer', transfer_time, device_model)
+            Metrics.count_bytes(device_model, size)
+
+class ProjectCache:
+    """Caches parsed device projects in process memory.
+
+    Every device model has its own TTL, the total size of cached projects is
+    bounded and the least recently used projects are evicted first. Concurrent
+    misses for the same model wait for a single upstream download.
+
+    Snapshots are kept as objects and shared by requests and the search index,
+    so a hit doesn't unpickle a copy and the size bound covers both. A cached
+    snapshot is never changed, a reused one is copied before it's changed.
+    """
+
+    CONFIG = settings.STAR_PROJECT_CACHE
+    # Test cases of every cached project are searchable by words
+    search_index = TestCaseIndex()
+    # Long texts of projects over the memory budget are kept on disk
+    MEMORY_BUDGET = settings.STAR_MEMORY_BUDGET
+    spill_directory = SpillDirectory(parent=MEMORY_BUDGET['SPILL_DIR'])
+
+    __lock = threading.Lock()
+    __entries = OrderedDict()
+    __in_flight = {}
+    __stats = {'hits': 0, 'misses': 0, 'revalidations': 0}
+    __listing = (None, 0.0)
+    __listing_loading = False
+
+    @classmethod
+    def get_ttl(cls, device_model: str) -> int:
+        """Returns TTL in seconds for requested device"""
+
+        return cls.CONFIG['TTL_PER_MODEL'].get(device_model, cls.CONFIG['TTL'])
+
+    @classmethod
+    def get_stats(cls) -> dict:
+        """Returns hit/miss counters and the current size of the cache"""
+
+        with cls.__lock:
+            return {**cls.__stats,
+                    'entries': len(cls.__entries),
+                    'size': sum(entry['size'] for entry in cls.__entries.values())}
+
+    @classmethod
+    def get_projects(cls) -> list:
+        """Returns the list of projects from STAR, newest updates first"""
+
+        return cls.get_listing().projects
+
+    @classmethod
+    def get_listing(cls, allow_stale=True) -> ProjectIndex:
+        """Returns the searchable list of projects, cached for LISTING_TTL.
+
+        Within LISTING_STALE_FOR after that the stale list is returned at once
+        and reloaded in background, unless `allow_stale` is False.
+        """
+
+        with cls.__lock:
+            listing, loaded_at = cls.__listing
+            age = time() - loaded_at
+            if listing is not None and age < cls.CONFIG['LISTING_TTL']:
+                return listing
+            is_stale = listing is not None and age < cls.CONFIG['LISTING_TTL'] + cls.CONFIG['LISTING_STALE_FOR']
+            reload_in_background = allow_stale and is_stale and not cls.__listing_loading
+            if reload_in_background:
+                cls.__listing_loading = True
+
+        if reload_in_background:
+            SnapshotStore.run_in_background(cls.__load_listing)
+        if allow_stale and is_stale:
+            return listing
+        return cls.__load_listing()
+
+    @classmethod
+    async def aget_listing(cls) -> ProjectIndex:
+        """Returns the searchable list of projects without blocking the event loop"""
+
+        return await asyncio.to_thread(cls.get_listing)
+
+    @classmethod
+    def __load_listing(cls) -> ProjectIndex:
+        try:
+            listing = ProjectIndex(Star.get_projects())
+            with cls.__lock:
+                cls.__listing = (listing, time())
+            return listing
+        finally:
+            with cls.__lock:
+                cls.__listing_loading = False
+
+    @classmethod
+    def get_last_update(cls, device_model: str):
+        """Returns the time when the project was updated in STAR, None if it's unknown"""
+
+        try:
+            listing = cls.get_listing(allow_stale=False)
+        except requests.RequestException:
+            # Without the listing the project is just downloaded again
+            return None
+
+        return listing.get_last_update(device_model)
+
+    @classmethod
+    def has_snapshot(cls, device_model: str) -> bool:
+        with cls.__lock:
+            entry = cls.__entries.get(device_model)
+            return entry is not None and entry['expires_at'] > time()
+
+    @classmethod
+    def clear(cls):
+        """Drops every cached project, also from the search index"""
+
+        with cls.__lock:
+            device_models = list(cls.__entries)
+            cls.__entries.clear()
+        for device_model in device_models:
+            cls.search_index.remove(device_model)
 
-        download_time = "{:.2f}".format(timer() - timer_start)
+    @classmethod
+    def peek_snapshot(cls, device_model: str):
+        """Returns the cached snapshot however old it is, None if it's not cached"""
+
+        with cls.__lock:
+            entry = cls.__entries.get(device_model)
+            return None if entry is None or entry['expires_at'] <= time() else entry['snapshot']
 
-        print(f'The project {device_model} has been downloaded in {download_time} seconds.')
+    @classmethod
+    def get_version(cls, device_model: str):
+        """Returns etag and download time of the cached project while it's within its TTL, None otherwise"""
 
-        return response.content
+        with cls.__lock:
+            entry = cls.__entries.get(device_model)
+            if entry is None or entry['checked_at'] + cls.get_ttl(device_model) <= time():
+                return None
+            return entry['version']
+
+    @classmethod
+    def set_snapshot(cls, device_model: str, snapshot: ProjectSnapshot, checked_at=None):
+        """Puts the snapshot to cache, it's revalidated on the next request if checked_at is 0"""
+
+        cls.__set_entry(device_model, snapshot, checked_at)
+
+    @classmethod
+    def get_snapshot(cls, device_model: str, load: Callable[[], ProjectSnapshot],
+                     fresh=False, revalidate=False) -> ProjectSnapshot:
+        """Returns a parsed project for requested device from cache or loads it.
+
+        A snapshot older than its TTL, or any snapshot when `revalidate` is set,
+        is kept as long as the project has not been updated in STAR since then.
+        A loaded snapshot is compared with the previous one to find changes.
+        """
+
+        entry = cls.__get_entry(device_model)
+        if not fresh and entry is not None and cls.__is_valid(device_model, entry, revalidate):
+            cls.__count('hits')
+            return entry['snapshot']
+
+        is_leader, download_done = cls.__join_download(device_model)
+        if not is_leader:
+            download_done.wait()
+            loaded_entry = cls.__get_entry(device_model)
+            if loaded_entry is not None and loaded_entry is not entry and \
+                    loaded_entry['checked_at'] + cls.get_ttl(device_model) > time():
+                cls.__count('hits')
+                return loaded_entry['snapshot']
+
+        cls.__count('misses')
+        try:
+            snapshot = load()
+            if entry is not None:
+                snapshot.compare_with(entry['snapshot'])
+            cls.__set_entry(device_model, snapshot)
+            if settings.STAR_LIVE_UPDATES['ENABLED']:
+                LiveUpdates.publish(snapshot, entry and entry['snapshot'], settings.STAR_LIVE_UPDATES['MAX_ROWS'])
+        finally:
+            if is_leader:
+                cls.__finish_download(device_model)
+        return snapshot
+
+    @classmethod
+    def __is_valid(cls, device_model: str, entry: dict, revalidate: bool) -> bool:
+        if not revalidate and entry['checked_at'] + cls.get_ttl(device_model) > time():
+            return True
+
+        last_update = to_aware(cls.get_last_update(device_model))
+        snapshot = entry['snapshot']
+        if last_update is None or snapshot.last_update is None or last_update > to_aware(snapshot.last_update):
+            return False
+
+        cls.__count('revalidations')
+        # Only the times of the entry move, the snapshot is neither copied nor indexed again
+        now = time()
+        with cls.__lock:
+            if cls.__entries.get(device_model) is entry:
+                entry['checked_at'] = now
+                entry['expires_at'] = now + cls.CONFIG['KEEP_FOR']
+        return True
+
+    @classmethod
+    def __get_entry(cls, device_model: str):
+        with cls.__lock:
+            entry = cls.__entries.get(device_model)
+            if entry is not None and entry['expires_at'] <= time():
+                del cls.__entries[device_model]
+                entry = None
+            if entry is not None:
+                cls.__entries.move_to_end(device_model)
+                return entry
+        # An expired project is not searchable either
+        cls.search_index.remove(device_model)
+        return None
+
+    @classmethod
+    def __set_entry(cls, device_model: str, snapshot: ProjectSnapshot, checked_at=None):
+        size = snapshot.size
+        if size > cls.MEMORY_BUDGET['SPILL_OVER']:
+            cls.spill_directory.spill(snapshot)
+            size = snapshot.size
+        if size > cls.CONFIG['MAX_SIZE']:
+            return
+
+        # The entry outlives its TTL to be revalidated by the update time of the project
+        now = time()
+        entry = {'snapshot': snapshot,
+                 'version': (snapshot.etag, snapshot.fetched_at),
+                 'size': size,
+                 'checked_at': now if checked_at is None else checked_at,
+                 'expires_at': now + cls.CONFIG['KEEP_FOR']}
+
+        with cls.__lock:
+            evicted = [model for model, old_entry in cls.__entries.items()
+                       if old_entry['expires_at'] <= now and model != device_model]
+            for model in evicted:
+                del cls.__entries[model]
+            cls.__entries[device_model] = entry
+            cls.__entries.move_to_end(device_model)
+            total_size = sum(old_entry['size'] for old_entry in cls.__entries.values())
+            while total_size > cls.CONFIG['MAX_SIZE']:
+                model, old_entry = cls.__entries.popitem(last=False)
+                total_size -= old_entry['size']
+                evicted.append(model)
+        for model in evicted:
+            cls.search_index.remove(model)
+
+        if settings.STAR_SEARCH_INDEX and not cls.search_index.has_snapshot(snapshot):
+            SnapshotStore.run_in_background(cls.__add_to_search_index, snapshot)
+
+    @classmethod
+    def __add_to_search_index(cls, snapshot: ProjectSnapshot):
+        # The project may have been evicted while it waited for the index, or while it was indexed
+        with cls.__lock:
+            if snapshot.device_model not in cls.__entries:
+                return
+        cls.search_index.add_snapshot(snapshot)
+        with cls.__lock:
+            is_cached = snapshot.device_model in cls.__entries
+        if not is_cached:
+            cls.search_index.remove(snapshot.device_model)
+
+    @classmethod
+    def __count(cls, name: str):
+        with cls.__lock:
+            cls.__stats[name] += 1
+
+    @classmethod
+    def __join_download(cls, device_model: str) -> tuple:
+        """Returns whether the caller has to download the project and an event set when it's done"""
+
+        with cls.__lock:
+            download_done = cls.__in_flight.get(device_model)
+            if download_done is not None:
+                return False, download_done
+            download_done = cls.__in_flight[device_model] = threading.Event()
+            return True, download_done
+
+    @classmethod
+    def __finish_download(cls, device_model: str):
+        with cls.__lock:
+            cls.__in_flight.pop(device_model).set()
 
 class Project:
 
-    NECESSARY_TC_ITEMS = (
-            'displayorder',
-            'TestDescription',
-            'TestCriteria',
-            'TestCaseName',
-            'CategoryName',
-            'Priority',
-            'usku_v2',
-            'usku_v3',
-            'mr_usku_v2',
-            'mr_usku_v3',
-            'tc911',
-            'CustomerComments',
-            'TPComment',
-            'MELDefectType',
-            'IsStep')
-
-    def __init__(self, device_model, filters={}):
+    NECESSARY_TC_ITEMS = NECESSARY_TC_ITEMS
+
+    LOAD_MANY = settings.STAR_LOAD_MANY
+    MEMORY_BUDGET = settings.STAR_MEMORY_BUDGET
+
+    def __init__(self, device_model, filters={}, streaming=False, fresh=False, snapshot=None):
         
-        star_instance = Star()
-        raw_project = star_instance.get_device_project(device_model)
         timer_start = timer()
 
-        if 'categories' in filters:
-            categories = [dict['title'] for dict in star_instance.ALL_ACTIVE_CATEGORIES if str(
-                dict['id']) in filters['categories']]
-        else:
-            categories = [dict['title'] for dict in star_instance.ALL_ACTIVE_CATEGORIES]
-
-        self.project_etree = parse_xml(raw_project)
-
-        self.list_of_binaries = self.__get_list_of_binaries(self.project_etree)
-        self.current_binary_version = self.list_of_binaries[-1]
-        self.previous_biniry_version = self.list_of_binaries[-2]
-        self.__remove_testcases_which_not_belong_to_categories(self.project_etree, categories)
-        raw_list_of_tc = self.__get_raw_list_of_test_case(self.project_etree, filters={})
-       
-        list_of_tc = []
-        testcase_int_id = 1
-
-        for tc in raw_list_of_tc:
-
-            test_case = {}
-            for el in tc:
-                if el.tag == self.current_binary_version:
-                    test_case['LastVersionResult'] = el.text
-                elif el.tag == self.previous_biniry_version:
-                    test_case['PreviousVersionResult'] = el.text
-                if el.tag in self.NECESSARY_TC_ITEMS and el.text != None:
-                    test_case[el.tag] = el.text
-            test_case['incude'] = True
-
-            if filters['Priority'] == 'P0' and test_case['Priority'] != 'P0':
-                test_case['incude'] = False
-            elif filters['Priority'] == 'P1' and test_case['Priority'] not in ('P0', 'P1'):
-                test_case['incude'] = False
-            elif filters['Priority'] == 'P2' and test_case['Priority'] not in ('P0', 'P1', 'P2'):
-                test_case['incude'] = False
-
-            if 'Variant' in filters and filters['Variant'] not in test_case:
-                test_case['incude'] = False
-
-            if 'tc911' not in filters and 'tc911' in test_case:
-                test_case['incude'] = False
-
-            if test_case.get('LastVersionResult') in ('Fail', 'NS', 'Block', 'NT') \
-                and 'CustomerComments' not in test_case:
-                test_case['issue'] = 'Missing Comment'
-            elif test_case.get('LastVersionResult') == 'Fail' and 'MELDefectType' not in test_case:
-                test_case['issue'] = 'Missing DefectType'
-
-            elif 'only_blank' in filters and 'LastVersionResult' in test_case and 'issue' not in test_case:
-                test_case['incude'] = False
-
-            if test_case['incude'] == True:
-                test_case['testcase_int_id'] = 'testcase_int_id-' + \
-                    str(testcase_int_id)
-                testcase_int_id += 1
-                list_of_tc.append(test_case)
-
-        sorted_list_by_tc = sorted(
-            list_of_tc, key=lambda d: d['displayorder'])
-
-
-        self.sorted_list_of_tc_by_category = sorted(
-            sorted_list_by_tc, key=lambda d: d['CategoryName'])
+        categories = MetadataCache.get_category_titles(filters.get('categories'))
+
+        self.filters = filters
+        if snapshot is None:
+            with measure('load', device_model):
+                snapshot = self.load_snapshot(device_model, streaming, fresh)
+        self.snapshot = snapshot
+
+        self.list_of_binaries = self.snapshot.list_of_binaries
+        self.current_binary_version = self.snapshot.current_binary_version
+        self.previous_biniry_version = self.snapshot.previous_binary_version
+
+        with measure('filter', device_model):
+            self.rows = filter_rows(self.snapshot, filters, categories)
 
-        
-        # parse_time = timer() - timer_start
         self.parse_time = "{:.2f}".format(timer() - timer_start)
 
-        print(f'The response for {device_model} has been parsed and data has been processed in {self.parse_time} seconds.')
+        logger.info('The project %s has been loaded and filtered in %s seconds.', device_model, self.parse_time)
+
+    @cached_property
+    def sorted_list_of_tc_by_category(self) -> list:
+        return [self.snapshot.get_test_case(row) for row in self.rows]
 
-        print('_' * 15)
+    @property
+    def changed_tc(self) -> int:
+        return sum(1 for row in self.rows if row in self.snapshot.changes)
 
- 
     @classmethod
-    def __get_list_of_binaries(cls, project_etree: etree._Element) -> list:
-        """Returns list of projects binaries versions"""
+    async def aload(cls, device_model, filters={}, streaming=False, fresh=False) -> 'Project':
+        """Returns a project loaded in a thread, so the event loop is not blocked by STAR or parsing.
 
-        namespace = {"xs": "http://www.w3.org/2001/XMLSchema"}
-        head_of_table = project_etree.xpath('(//xs:sequence)[1]/xs:element', namespaces=namespace)
+        The project is filtered in the thread too, category titles may be read from the database,
+        so it's the request's sync thread, whose connections Django closes when the request ends.
+        """
+
+        return await sync_to_async(cls)(device_model, filters, streaming, fresh)
 
-        list_of_binaries_versions = []
-        for el in head_of_table:
-            if el.attrib.get('name') not in ('mtp', 'PTN', 'sdf') and \
-                len(el.attrib.get('name')) == 3:
-                    list_of_binaries_versions.append(el.attrib.get('name'))
-        return list_of_binaries_versions
-    
     @classmethod
-    def __remove_testcases_which_not_belong_to_categories(cls, project_etree: etree._Element, categories: list):
-        test_groups = project_etree.xpath('//CategoryName')
-        for group in test_groups:
-            if group.text not in categories:
-                group.getparent().getparent().remove(group.getparent())
+    def load_snapshot(cls, device_model: str, streaming=False, fresh=False, revalidate=False) -> ProjectSnapshot:
+        """Returns a parsed project for requested device, cached if possible"""
+
+        load = lambda: cls.parse_snapshot(device_model, streaming)
+
+        if not fresh and SnapshotStore.CONFIG['SERVE_STORED'] and not ProjectCache.has_snapshot(device_model):
+            stored_snapshot = SnapshotStore.load_latest(device_model)
+            if stored_snapshot is not None:
+                # The stored project is shown at once and revalidated with STAR in background
+                ProjectCache.set_snapshot(device_model, stored_snapshot, checked_at=0)
+                SnapshotStore.run_in_background(ProjectCache.get_snapshot, device_model, load, False, True)
+                return stored_snapshot
+
+        return ProjectCache.get_snapshot(device_model, load, fresh, revalidate)
 
     @classmethod
-    def __get_raw_list_of_test_case(cls, project_etree: etree._Element, filters={}) -> list:
-        """Returns list of etree element with test cases"""
+    def load_many(cls, device_models: Iterable[str], filters={}, fresh=False,
+                  download_workers=None, parse_workers=None) -> Iterator[tuple]:
+        """Yields (device model, Project or exception) for every device as soon as it's loaded.
+
+        Projects are downloaded by a pool of threads and parsed by a pool of
+        processes, so the total time is close to the time of the slowest device.
+        """
+
+        download_workers = download_workers or cls.LOAD_MANY['DOWNLOAD_WORKERS']
+        parse_workers = parse_workers or cls.LOAD_MANY['PARSE_WORKERS']
+
+        with ThreadPoolExecutor(max_workers=download_workers) as download_pool, \
+                ProcessPoolExecutor(max_workers=parse_workers, mp_context=PARSE_CONTEXT) as parse_pool:
+
+            def load(device_model: str) -> ProjectSnapshot:
+                return ProjectCache.get_snapshot(device_model,
+                                                 lambda: cls.parse_snapshot(device_model, parse_pool=parse_pool),
+                                                 fresh)
+
+            futures = {download_pool.submit(load, device_model): device_model
+                       for device_model in dict.fromkeys(device_models)}
+            for future in as_completed(futures):
+                device_model = futures[future]
+                try:
+                    yield device_model, cls(device_model, filters, snapshot=future.result())
+                except Exception as error:
+                    yield device_model, error
+
+    @staticmethod
+    def parse_chunks(device_model: str, chunks: Iterable[bytes]) -> ProjectSnapshot:
+        """Parses a project by a streaming pass over chunks of the response"""
+
+        timer_start = timer()
+        stream_parser = ProjectStreamParser(chunks)
+        snapshot = ProjectSnapshot.from_test_case_elements(device_model,
+                                                           stream_parser.list_of_binaries,
+                                                           stream_parser.iter_test_cases())
+        snapshot.etag = stream_parser.etag
+        snapshot.timings = {'xml_parse': stream_parser.parse_time,
+                            'record_build': timer() - timer_start - stream_parser.read_time}
+        return snapshot
 
-        namespace = {"diffgr": "urn:schemas-microsoft-com:xml-diffgram-v1"}
-        if 'only_blank' in filters:
-            list_of_tc = project_etree.xpath(f'//TestCaseResults2[@diffgr:hasChanges="modified" and ( not(descendant::{cls.current_binary_version}) or (descendant::{cls.current_binary_version} and descendant::{cls.current_binary_version}[text()]) )]', namespaces=namespace)
+    @classmethod
+    def parse_response(cls, device_model: str, chunks: Iterable[bytes], streaming=False, parse_pool=None,
+                       previous=None) -> ProjectSnapshot:
+        """Parses a raw project, in `parse_pool` if it's given.
+
+        A response with the etag of the `previous` snapshot is not parsed
+        again, the previous snapshot is returned instead.
+        """
+
+        if streaming:
+            # Test cases are parsed while the project is downloading,
+            # so neither the whole response nor the tree is kept in memory
+            return cls.parse_chunks(device_model, chunks)
+
+        raw_file, etag = spool_chunks(chunks, cls.MEMORY_BUDGET['SPOOL_OVER'])
+        with raw_file:
+            if previous is not None and previous.etag == etag:
+                logger.info('The project %s has not changed since the previous download.', device_model)
+                # The previous snapshot may be cached, the copy shares its columns
+                snapshot = copy.copy(previous)
+                snapshot.timings = {}
+                return snapshot
+
+            if raw_file.seek(0, os.SEEK_END) > cls.MEMORY_BUDGET['SPOOL_OVER']:
+                # The response has been written to disk, a tree of it would not fit the budget either
+                raw_file.seek(0)
+                return cls.parse_chunks(device_model, iter(partial(raw_file.read, Star.STREAM_CHUNK_SIZE), b''))
+
+            raw_file.seek(0)
+            raw_project = raw_file.read()
+        if parse_pool is None:
+            return parse_project(device_model, raw_project)
+        return parse_pool.submit(parse_project, device_model, raw_project).result()
+
+    @classmethod
+    def iter_response(cls, device_model: str) -> Iterator[bytes]:
+        """Returns chunks of a raw project from STAR, or from the archive in replay mode"""
+
+        if RawArchive.CONFIG['REPLAY']:
+            return RawArchive.iter_latest_response(device_model)
+
+        chunks = Star.iter_device_project(device_model)
+        if RawArchive.CONFIG['ENABLED']:
+            chunks = RawArchive.record(device_model, chunks)
+        return chunks
+
+    @classmethod
+    def replay(cls, device_model: str, digest=None, filters={}, streaming=False) -> 'Project':
+        """Returns a project parsed from an archived response, the newest one of the device if `digest` is None.
+
+        Neither STAR nor the cache is used, so parsing can be debugged and
+        benchmarked offline on real responses.
+        """
+
+        if digest is None:
+            chunks = RawArchive.iter_latest_response(device_model)
         else:
-            list_of_tc = project_etree.xpath('//TestCaseResults2[@diffgr:hasChanges="modified"]', namespaces=namespace)
-        
-        return list_of_tc
+            chunks = RawArchive.iter_response(digest)
+        return cls(device_model, filters, snapshot=cls.parse_response(device_model, chunks, streaming))
+
+    @classmethod
+    def parse_snapshot(cls, device_model: str, streaming=False, parse_pool=None) -> ProjectSnapshot:
+        """Downloads and parses a project for requested device, in `parse_pool` if it's given"""
+
+        # Taken before the download, so an update made during it is not missed
+        last_update = ProjectCache.get_last_update(device_model)
+
+        # A whole response is hashed before it's parsed, so an unchanged one reuses the cached project
+        previous = None if streaming else ProjectCache.peek_snapshot(device_model)
+        if previous is not None and not previous.has_all_results:
+            previous = None
+        snapshot = cls.parse_response(device_model, cls.iter_response(device_model), streaming, parse_pool, previous)
+
+        Metrics.record_timings(snapshot.timings, device_model)
+        snapshot.last_update = last_update
+        if SnapshotStore.CONFIG['ENABLED']:
+            SnapshotStore.run_in_background(SnapshotStore.save, snapshot)
+        return snapshot
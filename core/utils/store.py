@@ -0,0 +1,137 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.utils.timezone import is_naive, make_aware
+from core.models import DeviceSnapshot, TestCaseResult
+from core.utils.snapshot import ProjectSnapshot, TestCaseRecord
+
+logger = logging.getLogger(__name__)
+
+# Names of test case record fields and their model fields
+TEST_CASE_RESULT_FIELDS = {
+    'displayorder': 'display_order',
+    'TestDescription': 'test_description',
+    'TestCriteria': 'test_criteria',
+    'TestCaseName': 'test_case_name',
+    'CategoryName': 'category',
+    'Priority': 'priority',
+    'usku_v2': 'usku_v2',
+    'usku_v3': 'usku_v3',
+    'mr_usku_v2': 'mr_usku_v2',
+    'mr_usku_v3': 'mr_usku_v3',
+    'tc911': 'tc911',
+    'CustomerComments': 'customer_comments',
+    'TPComment': 'tp_comment',
+    'MELDefectType': 'mel_defect_type',
+    'IsStep': 'is_step',
+    'LastVersionResult': 'last_result',
+    'PreviousVersionResult': 'previous_result',
+    'issue': 'issue',
+}
+
+def to_aware(value):
+    """Returns aware datetime, naive datetime is taken as UTC"""
+
+    if value is not None and is_naive(value):
+        return make_aware(value, timezone.utc)
+    return value
+
+class SnapshotStore:
+    """Stores parsed projects in the database.
+
+    A stored snapshot lets a device page render right after a restart while
+    the project is fetched from STAR, and keeps results history across binaries.
+    """
+
+    CONFIG = settings.STAR_SNAPSHOT_STORE
+
+    # Writes and background refreshes don't hold up the request
+    executor = ThreadPoolExecutor(max_workers=CONFIG['WORKERS'], thread_name_prefix='star-store')
+
+    @classmethod
+    def save(cls, snapshot: ProjectSnapshot) -> DeviceSnapshot:
+        """Saves the snapshot unless the same response is already the latest stored one"""
+
+        latest = DeviceSnapshot.objects.filter(device_model=snapshot.device_model).only('etag').first()
+        if latest is not None and snapshot.etag and latest.etag == snapshot.etag:
+            return latest
+
+        with transaction.atomic():
+            device_snapshot = DeviceSnapshot.objects.create(
+                device_model=snapshot.device_model,
+                list_of_binaries=snapshot.list_of_binaries,
+                binary_version=snapshot.current_binary_version,
+                etag=snapshot.etag or '',
+                last_update=to_aware(snapshot.last_update),
+                fetched_at=datetime.fromtimestamp(snapshot.fetched_at, tz=timezone.utc),
+                total_tc=snapshot.total_tc)
+
+            TestCaseResult.objects.bulk_create(
+                (TestCaseResult(snapshot=device_snapshot,
+                                device_model=snapshot.device_model,
+                                binary_version=snapshot.current_binary_version,
+                                row=row,
+                                **{field: getattr(tc, name) for name, field in TEST_CASE_RESULT_FIELDS.items()})
+                 for row, tc in enumerate(snapshot.iter_test_cases())),
+                batch_size=cls.CONFIG['BATCH_SIZE'])
+
+        cls.__remove_old_snapshots(snapshot.device_model)
+        return device_snapshot
+
+    @classmethod
+    def load_latest(cls, device_model: str):
+        """Returns the newest stored snapshot of the device, None if nothing is stored"""
+
+        device_snapshot = DeviceSnapshot.objects.filter(device_model=device_model).first()
+        if device_snapshot is None:
+            return None
+
+        test_cases = [TestCaseRecord(**{name: result[field] for name, field in TEST_CASE_RESULT_FIELDS.items()})
+                      for result in device_snapshot.test_cases.values(*TEST_CASE_RESULT_FIELDS.values())]
+
+        snapshot = ProjectSnapshot.from_test_cases(device_model,
+                                                   device_snapshot.list_of_binaries,
+                                                   test_cases,
+                                                   device_snapshot.etag or None)
+        snapshot.fetched_at = device_snapshot.fetched_at.timestamp()
+        snapshot.last_update = device_snapshot.last_update
+        return snapshot
+
+    @classmethod
+    def get_history(cls, device_model: str, test_case_name: str) -> list:
+        """Returns results of the test case for every stored binary, oldest first"""
+
+        results = TestCaseResult.objects \
+            .filter(device_model=device_model, test_case_name=test_case_name) \
+            .order_by('snapshot__fetched_at') \
+            .values('binary_version', 'last_result', 'customer_comments')
+
+        # The latest snapshot of every binary wins, binaries stay in order of appearance
+        history = {}
+        for result in results:
+            history[result['binary_version']] = result
+        return list(history.values())
+
+    @classmethod
+    def run_in_background(cls, function, *args):
+        """Runs the function in a store thread with its own database connection"""
+
+        cls.executor.submit(cls.__run_in_thread, function, *args)
+
+    @classmethod
+    def __run_in_thread(cls, function, *args):
+        close_old_connections()
+        try:
+            function(*args)
+        except Exception:
+            logger.exception('%s has failed in background', function.__qualname__)
+        finally:
+            close_old_connections()
+
+    @classmethod
+    def __remove_old_snapshots(cls, device_model: str):
+        old_snapshots = DeviceSnapshot.objects.filter(device_model=device_model) \
+            .values_list('id', flat=True)[cls.CONFIG['KEEP_SNAPSHOTS']:]
+        DeviceSnapshot.objects.filter(id__in=list(old_snapshots)).delete()
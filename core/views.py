@@ -1,106 +1,543 @@
-from django.shortcuts import render
+import asyncio
+import hashlib
+import json
+from asgiref.sync import sync_to_async
+from django.shortcuts import redirect, render
+from django.http import FileResponse, HttpResponse, HttpResponseBadRequest, JsonResponse, StreamingHttpResponse
+from django.conf import settings
+from django.core.cache import caches
 from django.core.paginator import Paginator
-from core.utils.star import Star, Project
-from core.models import Category, Team
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+from core.utils.star import Project, ProjectCache
+from core.utils.listing import SORT_KEYS
+from core.utils.dashboard import Dashboard
+from core.models import DeviceSummary
+from core.utils.prefetch import prefetch_scheduler
+from core.utils.metadata import MetadataCache
+from core.utils.metrics import Metrics, collect_timings, measure
+from core.utils.live import LiveUpdates
+from core.utils.snapshot import get_filter_mask, sort_rows
+from core.utils.export import EXPORT_FORMATS, is_format_supported, iter_csv, iter_ndjson, iter_rows, write_xlsx
+
+# Rendered windows of test cases and fragments of device pages
+render_cache = caches[settings.STAR_RENDER_CACHE['CACHE_ALIAS']]
+
+# Projects on one page of the index
+PROJECTS_LIMIT = 112
+
+# Results of the last binary in columns of the dashboard, in this order
+DASHBOARD_RESULTS = ('Pass', 'Fail', 'Block', 'NS', 'NIS', 'NT', 'Blank')
+
+# Test cases in one window of the table
+ROWS_LIMIT = 100
+MAX_ROWS_LIMIT = 500
+
+ROW_COLUMNS = ('displayorder', 'tc911', 'CategoryName', 'Priority', 'TestDescription', 'TestCriteria',
+               'PreviousVersionResult', 'LastVersionResult', 'issue')
+
+# How long a page waits to connect to live updates again
+LIVE_RETRY_MS = 10000
+
+# Columns of test cases found by the search across devices
+SEARCH_RESULT_COLUMNS = ('displayorder', 'CategoryName', 'Priority', 'TestCaseName', 'TestDescription',
+                         'LastVersionResult')
+
+# Columns of test cases found by comparison of binaries
+REGRESSION_COLUMNS = ('displayorder', 'CategoryName', 'Priority', 'TestCaseName', 'TestDescription')
 
 def index(request):
-    projects_table = Star.get_projects()
-    paginator = Paginator(projects_table, 112)
+    listing = ProjectCache.get_listing()
+    return render_index(request, listing)
+
+async def index_async(request):
+    listing = await ProjectCache.aget_listing()
+    return render_index(request, listing)
+
+def render_index(request, listing):
+    query = request.GET.get('q', '')
+    sort = request.GET.get('sort', 'update')
+    projects_table = listing.search(query, sort)
+
+    paginator = Paginator(projects_table, PROJECTS_LIMIT)
     page_number = request.GET.get('page')
     page_obj = paginator.get_page(page_number)
 
-    context = {'page_obj': page_obj}
+    context = {'page_obj': page_obj, 'q': query, 'sort': sort}
 
     return render(request, 'core/index.html', context)
 
+def search_projects(request):
+    """Returns projects which names contain the query, for the search as you type on the index page"""
+
+    sort = request.GET.get('sort', 'update')
+    if sort not in SORT_KEYS:
+        return HttpResponseBadRequest(f'Projects can be sorted only by {", ".join(SORT_KEYS)}')
+    try:
+        limit = get_int_param(request.GET, 'limit', PROJECTS_LIMIT, 1, PROJECTS_LIMIT)
+    except ValueError:
+        return HttpResponseBadRequest('limit must be an integer')
+
+    projects = ProjectCache.get_listing().search(request.GET.get('q', ''), sort,
+                                                 prefix=request.GET.get('prefix') == '1')
+    return JsonResponse({
+        'total': len(projects),
+        'projects': [{'name': project.get('Name'), 'last_update': project.get('Last_x0020_Update')}
+                     for project in projects[:limit]],
+    })
+
+def search_test_cases(request):
+    """Returns test cases of every cached device which texts have all words of the query.
+
+    Test cases can be filtered by ?device=, ?category= ids, ?priority= and
+    ?result=, where Blank is a test case without result.
+    """
+
+    categories = request.GET.getlist('category')
+    results = request.GET.getlist('result')
+    try:
+        offset = get_int_param(request.GET, 'offset', 0, 0)
+        limit = get_int_param(request.GET, 'limit', ROWS_LIMIT, 1, MAX_ROWS_LIMIT)
+    except ValueError:
+        return HttpResponseBadRequest('offset and limit must be integers')
+    with measure('search'):
+        total, found = ProjectCache.search_index.search(
+            request.GET.get('q', ''),
+            device_models=set(request.GET.getlist('device')) or None,
+            categories=MetadataCache.get_category_titles(categories) if categories else None,
+            priority=request.GET.get('priority'),
+            results={None if result == 'Blank' else result for result in results} if results else None,
+            offset=offset,
+            limit=limit)
+
+    return JsonResponse({
+        'total': total,
+        'offset': offset,
+        'test_cases': [{'device': snapshot.device_model,
+                        'binary': snapshot.current_binary_version,
+                        'row': row,
+                        **{name: snapshot.get_value(name, row) for name in SEARCH_RESULT_COLUMNS}}
+                       for snapshot, row in found],
+    })
+
 def view(request, device_name):
-    all_active_categories = list(Category.objects.filter(is_active=True).values('id', 'title'))
-    teams_with_categories = []
-    for team in Team.objects.all():
-        team_json = {}
-        team_json['team_id'] = 'team_' + str(team.id)
-        team_json['team_name'] = team.name
-        team_json['team_categories'] = list(
-            team.categories.values('id', 'title')
-        )
-        teams_with_categories.append(team_json)
-
-    context = {'categories': all_active_categories,
-               'teams': teams_with_categories,
+    metadata = MetadataCache.get_metadata()
+
+    context = {'categories': metadata['categories'],
+               'teams': metadata['teams'],
                'title': device_name
                }
-  
-    categories = []
 
-    if request.method == 'POST':
-        filters = {}
-        if request.POST.getlist('category'):
-            categories = request.POST.getlist('category')
-            filters['categories'] = categories
-
-        if request.POST.get('only_blank'):
-            filters['only_blank'] = 'on'
-            context['only_blank'] = True
-
-        if request.POST.get('tc911'):
-            filters['tc911'] = 'on'
-            context['tc911'] = True
-
-        if request.POST.get('Priority') != 'Priority':
-            priotiry = request.POST.get('Priority')
-            filters['Priority'] = priotiry
-            context['Priority'] = priotiry
-
-        if request.POST.get('Variant') != 'None':
-            variant = request.POST.get('Variant')
-            filters['Variant'] = variant
-            context['Variant'] = variant
-
-        # project = Project.get_phone_project2(
-        #     phone_model=device_name, filter=filter)
-        whole_project = Project(device_name, filters)
-        
-        project = {
-            'testcases': whole_project.sorted_list_of_tc_by_category,
-            'last_binary_version': whole_project.current_binary_version,
-            'previous_binaty_version': whole_project.previous_biniry_version,
-            'total_tc': len(whole_project.sorted_list_of_tc_by_category),
-            'total_time': whole_project.parse_time
+    with collect_timings() as timings:
+        if request.method == 'POST':
+            filters = get_filters(request.POST, context)
+            whole_project = Project(device_name, filters,
+                                    streaming=settings.STAR_STREAMING_PARSE,
+                                    fresh=request.GET.get('fresh') == '1')
+            add_project_to_context(context, device_name, whole_project)
+        else:
+            add_cookies_to_context(request, context)
+
+        if settings.DEBUG:
+            context['timings'] = timings
+        with measure('render', device_name):
+            response = render(request, 'core/view.html', context)
+
+    save_cookies(request, response)
+    return response
+
+async def view_async(request, device_name):
+    metadata = await MetadataCache.aget_metadata()
+
+    context = {'categories': metadata['categories'],
+               'teams': metadata['teams'],
+               'title': device_name
+               }
+
+    with collect_timings() as timings:
+        if request.method == 'POST':
+            filters = get_filters(request.POST, context)
+            # The download and the parsing run in a thread, the event loop keeps serving other devices
+            whole_project = await Project.aload(device_name, filters,
+                                                streaming=settings.STAR_STREAMING_PARSE,
+                                                fresh=request.GET.get('fresh') == '1')
+            add_project_to_context(context, device_name, whole_project)
+        else:
+            add_cookies_to_context(request, context)
+
+        if settings.DEBUG:
+            context['timings'] = timings
+        with measure('render', device_name):
+            response = render(request, 'core/view.html', context)
+
+    save_cookies(request, response)
+    return response
+
+def view_rows(request, device_name):
+    """Returns a sorted window of filtered test cases of the project for the table.
+
+    Windows are cached as JSON per version of the project, so a refresh of an
+    unchanged project gets the same bytes or 304 without filtering and sorting.
+    While the cached project is fresh, its version is known without loading it.
+    """
+
+    try:
+        offset = get_int_param(request.GET, 'offset', 0, 0)
+        limit = get_int_param(request.GET, 'limit', ROWS_LIMIT, 1, MAX_ROWS_LIMIT)
+    except ValueError:
+        return HttpResponseBadRequest('offset and limit must be integers')
+
+    filters = get_filters(request.GET, {})
+    sort_key = request.GET.get('sort') or ''
+    categories = MetadataCache.get_category_titles(filters.get('categories'))
+    parts = ('rows', get_filters_key(filters), sorted(categories), sort_key, offset, limit)
+
+    cached_version = ProjectCache.get_version(device_name)
+    if cached_version is not None:
+        etag, fetched_at = cached_version
+        response = get_not_modified(request, get_project_version(device_name, etag, fetched_at, *parts), fetched_at)
+        if response is not None:
+            return response
+
+    with measure('load', device_name):
+        snapshot = Project.load_snapshot(device_name, settings.STAR_STREAMING_PARSE)
+
+    def get_rows_json() -> dict:
+        whole_project = Project(device_name, filters, snapshot=snapshot)
+        rows = whole_project.rows
+        if sort_key:
+            with measure('sort', device_name):
+                rows = sort_rows(snapshot, rows, sort_key)
+
+        return {
+            'etag': snapshot.etag or '',
+            'total': len(rows),
+            'offset': offset,
+            'rows': get_test_cases_json(snapshot, rows[offset:offset + limit]),
         }
-        context['selected_categories'] = list(map(int, categories))
-        for item in project:
-            context[item] = project[item]
-        context['button'] = 'Refresh project'
 
+    version = get_snapshot_version(snapshot, *parts)
+    return get_cached_json(request, version, snapshot.fetched_at, get_rows_json)
+
+async def view_live(request, device_name):
+    """Streams changed test cases of the project as server-sent events, for ASGI servers.
+
+    The page passes its filters, so every changed row says whether the page
+    has to show it. The device is kept warm by the prefetch scheduler while
+    the page is open, so STAR is asked once per TTL however many pages are open.
+    """
+
+    filters = get_filters(request.GET, {})
+    categories = await sync_to_async(MetadataCache.get_category_titles)(filters.get('categories'))
+    key = (get_filters_key(filters), tuple(sorted(categories)))
+
+    def get_live_json(update) -> dict:
+        snapshot = update.snapshot
+        mask = get_filter_mask(snapshot, filters, categories)
+        return {
+            'etag': snapshot.etag or '',
+            'previous_etag': update.previous_etag,
+            'reset': update.reset,
+            'reload': update.reload,
+            'total': mask.bit_count(),
+            'rows': [{**row_json, 'matches': bool(mask >> row_json['row'] & 1)}
+                     for row_json in get_test_cases_json(snapshot, list(update.rows))],
+        }
+
+    async def stream():
+        queue = LiveUpdates.subscribe(device_name)
+        try:
+            yield f'retry: {LIVE_RETRY_MS}\n\n'
+            while True:
+                try:
+                    update = await asyncio.wait_for(queue.get(), settings.STAR_LIVE_UPDATES['HEARTBEAT'])
+                except asyncio.TimeoutError:
+                    prefetch_scheduler.touch(device_name)
+                    yield ': keep-alive\n\n'
+                    continue
+                data = json.dumps(update.get_json(key, lambda: get_live_json(update)), cls=DjangoJSONEncoder)
+                yield f'event: changes\ndata: {data}\n\n'
+        finally:
+            LiveUpdates.unsubscribe(device_name, queue)
+
+    prefetch_scheduler.touch(device_name)
+    response = StreamingHttpResponse(stream(), content_type='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    # Events are not held by a buffering proxy
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+def view_comments(request, device_name, row):
+    """Returns comments of one test case, they are loaded when the comments are opened.
+
+    The row is read from the cached project however old it is, the page asks
+    for comments of its own version of the project.
+    """
+
+    snapshot = ProjectCache.peek_snapshot(device_name)
+    if snapshot is None:
+        snapshot = Project.load_snapshot(device_name, settings.STAR_STREAMING_PARSE)
+    if request.GET.get('etag', snapshot.etag or '') != (snapshot.etag or '') or not 0 <= row < snapshot.total_tc:
+        return JsonResponse({'error': 'The project has been updated, refresh the page'}, status=409)
+
+    return JsonResponse({
+        'TPComment': snapshot.get_value('TPComment', row),
+        'CustomerComments': snapshot.get_value('CustomerComments', row),
+    })
+
+def view_regressions(request, device_name):
+    """Returns regressions, flaky and never run test cases of filtered test cases across ?from= to ?to= binaries"""
+
+    filters = get_filters(request.GET, {})
+    whole_project = Project(device_name, filters, streaming=settings.STAR_STREAMING_PARSE)
+    if not whole_project.snapshot.has_all_results:
+        whole_project = Project(device_name, filters, streaming=settings.STAR_STREAMING_PARSE, fresh=True)
+    snapshot = whole_project.snapshot
+
+    try:
+        columns = snapshot.results.get_columns(request.GET.get('from'), request.GET.get('to'))
+    except ValueError as error:
+        return HttpResponseBadRequest(f'Binaries can be compared only from older to newer of the project: {error}')
+
+    with measure('compare', device_name):
+        comparison = snapshot.results.compare(whole_project.rows, columns)
+
+    def get_test_case_json(row) -> dict:
+        test_case = {name: snapshot.get_value(name, row) for name in REGRESSION_COLUMNS}
+        test_case['row'] = row
+        test_case['results'] = snapshot.results.get_results(row, columns)
+        return test_case
+
+    return JsonResponse({
+        'etag': snapshot.etag or '',
+        'binaries': snapshot.results.binaries[columns.start:columns.stop],
+        'total': len(whole_project.rows),
+        'regressions': [{**get_test_case_json(row), 'from': from_binary, 'to': to_binary}
+                        for row, from_binary, to_binary in comparison['regressions']],
+        'flaky': [{**get_test_case_json(row), 'flips': flips} for row, flips in comparison['flaky']],
+        'never_run': [get_test_case_json(row) for row in comparison['never_run']],
+    })
+
+def export(request, device_name=None):
+    """Streams filtered test cases of one device, or of every ?device= one after another"""
+
+    export_format = request.GET.get('format', 'csv')
+    if not is_format_supported(export_format):
+        return HttpResponseBadRequest(f'Export to {export_format} is not supported')
+
+    device_models = [device_name] if device_name else request.GET.getlist('device')
+    if not device_models:
+        return HttpResponseBadRequest('No devices to export')
+
+    filters = get_filters(request.GET, {})
+    # The first project is loaded right away, so a failed download is an error response
+    first_project = Project(device_models[0], filters, streaming=settings.STAR_STREAMING_PARSE)
+    rows = iter_rows(iter_projects(first_project, device_models[1:], filters))
+
+    if device_name:
+        filename = f'{device_name}-{first_project.current_binary_version}.{export_format}'
     else:
-        context['button'] = 'Show project'
-        if request.COOKIES.get('Categories'):
-            selected_categories = request.COOKIES.get('Categories').split('-')
-            selected_categories = list(map(int, selected_categories))
-            context['selected_categories'] = selected_categories
-        if request.COOKIES.get('Only_blank') == 'True':
-            context['only_blank'] = True
-        if request.COOKIES.get('tc911') == 'True':
-            context['tc911'] = True
-
-    response = render(request, 'core/view.html', context)
-    # Save coockies
+        filename = f'projects.{export_format}'
+
+    if export_format == 'xlsx':
+        return FileResponse(write_xlsx(rows), as_attachment=True, filename=filename,
+                            content_type=EXPORT_FORMATS['xlsx'])
+
+    content = iter_csv(rows) if export_format == 'csv' else iter_ndjson(rows)
+    response = StreamingHttpResponse(content, content_type=EXPORT_FORMATS[export_format])
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+def iter_projects(first_project, device_models, filters):
+    """Yields projects one by one, every next one is loaded when the previous is exported"""
+
+    yield first_project
+    for device_model in device_models:
+        yield Project(device_model, filters, streaming=settings.STAR_STREAMING_PARSE)
+
+def get_project_version(device_model: str, etag, fetched_at: float, *parts) -> str:
+    """Returns ETag of a response made of a load of the project and of the request parts"""
+
+    key = repr((device_model, etag, fetched_at) + parts)
+    return '"' + hashlib.sha1(key.encode('utf-8')).hexdigest() + '"'
+
+def get_snapshot_version(snapshot, *parts) -> str:
+    """Returns ETag of a response made of this load of the project and of the request parts"""
+
+    return get_project_version(snapshot.device_model, snapshot.etag, snapshot.fetched_at, *parts)
+
+def get_filters_key(filters: dict) -> tuple:
+    return tuple(sorted((name, tuple(sorted(value)) if isinstance(value, list) else value)
+                        for name, value in filters.items()))
+
+def get_not_modified(request, version: str, fetched_at: float):
+    """Returns 304 if the client has this version of the response, None otherwise"""
+
+    response = get_conditional_response(request, etag=version, last_modified=int(fetched_at))
+    if response is not None:
+        set_version_headers(response, version, fetched_at)
+    return response
+
+def get_cached_json(request, version: str, fetched_at: float, get_json) -> HttpResponse:
+    """Returns 304 if the client has this version, otherwise its JSON from the render cache.
+
+    The browser revalidates the response every time, so a new download of the
+    project is shown at once.
+    """
+
+    response = get_not_modified(request, version, fetched_at)
+    if response is None:
+        cache_key = 'star-rendered-' + version.strip('"')
+        content = render_cache.get(cache_key)
+        if content is None:
+            content = json.dumps(get_json(), cls=DjangoJSONEncoder).encode('utf-8')
+            render_cache.set(cache_key, content, settings.STAR_RENDER_CACHE['TIMEOUT'])
+        response = HttpResponse(content, content_type='application/json')
+        set_version_headers(response, version, fetched_at)
+    return response
+
+def set_version_headers(response, version: str, fetched_at: float):
+    response.headers['ETag'] = version
+    response.headers['Last-Modified'] = http_date(int(fetched_at))
+    patch_cache_control(response, private=True, no_cache=True)
+
+def get_int_param(params, name: str, default: int, minimum: int, maximum=None) -> int:
+    """Returns an integer parameter kept within the range, raises ValueError if it's not an integer"""
+
+    value = params.get(name)
+    if not value:
+        return default
+    value = max(int(value), minimum)
+    return value if maximum is None else min(value, maximum)
+
+def get_test_cases_json(snapshot, rows: list) -> list:
+    """Returns test cases of the rows for the table, values are read column by column"""
+
+    columns = {name: snapshot.get_values(name, rows) for name in (*ROW_COLUMNS, 'TPComment', 'CustomerComments')}
+    rows_json = []
+    for i, row in enumerate(rows):
+        test_case = {name: columns[name][i] for name in ROW_COLUMNS}
+        test_case['row'] = row
+        test_case['changes'] = snapshot.changes.get(row, ())
+        test_case['has_comments'] = bool(columns['TPComment'][i] or columns['CustomerComments'][i])
+        rows_json.append(test_case)
+    return rows_json
+
+def get_filters(form, context) -> dict:
+    """Returns filters of the project from the form and shows them in the context"""
+
+    filters = {}
+    if form.getlist('category'):
+        filters['categories'] = form.getlist('category')
+
+    if form.get('only_blank'):
+        filters['only_blank'] = 'on'
+        context['only_blank'] = True
+
+    if form.get('tc911'):
+        filters['tc911'] = 'on'
+        context['tc911'] = True
+
+    # Selects of the form send their placeholders, a GET request may have no parameter at all
+    priority = form.get('Priority')
+    if priority not in (None, 'Priority'):
+        filters['Priority'] = priority
+        context['Priority'] = priority
+
+    variant = form.get('Variant')
+    if variant not in (None, 'None'):
+        filters['Variant'] = variant
+        context['Variant'] = variant
+
+    return filters
+
+def add_project_to_context(context, device_name, whole_project):
+    prefetch_scheduler.touch(device_name)
+
+    # Test cases themselves are loaded by the page from view_rows
+    project = {
+        'last_binary_version': whole_project.current_binary_version,
+        'previous_binaty_version': whole_project.previous_biniry_version,
+        'total_tc': len(whole_project.rows),
+        'changed_tc': whole_project.changed_tc,
+        'total_time': whole_project.parse_time
+    }
+    context['project_etag'] = whole_project.snapshot.etag or ''
+    context['project_version'] = get_snapshot_version(whole_project.snapshot, 'table')
+    context['render_timeout'] = settings.STAR_RENDER_CACHE['TIMEOUT']
+    context['live_updates'] = settings.STAR_LIVE_UPDATES['ENABLED']
+    context['selected_categories'] = list(map(int, whole_project.filters.get('categories', [])))
+    for item in project:
+        context[item] = project[item]
+    context['button'] = 'Refresh project'
+    context['cache_stats'] = ProjectCache.get_stats()
+
+def add_cookies_to_context(request, context):
+    context['button'] = 'Show project'
+    if request.COOKIES.get('Categories'):
+        selected_categories = request.COOKIES.get('Categories').split('-')
+        selected_categories = list(map(int, selected_categories))
+        context['selected_categories'] = selected_categories
+    if request.COOKIES.get('Only_blank') == 'True':
+        context['only_blank'] = True
+    if request.COOKIES.get('tc911') == 'True':
+        context['tc911'] = True
+
+def save_cookies(request, response):
+    if request.method != 'POST':
+        return
+
+    response.set_cookie('Categories', '-'.join(request.POST.getlist('category')))
+    if request.POST.get('only_blank') == 'on':
+        response.set_cookie('Only_blank', 'True')
+    else:
+        response.set_cookie('Only_blank', 'False')
+
+    if request.POST.get('tc911') == 'on':
+        response.set_cookie('tc911', 'True')
+    else:
+        response.set_cookie('tc911', 'False')
+
+    if request.POST.get('Priority') != 'None':
+        response.set_cookie('Priority', request.POST.get('Priority'))
+
+    if request.POST.get('Variant') != 'None':
+        response.set_cookie('Variant', request.POST.get('Variant'))
+
+def dashboard(request):
+    """Shows counts of results and issues of every active device, POST refreshes them in background"""
+
     if request.method == 'POST':
-        response.set_cookie('Categories', '-'.join(categories))
-        if request.POST.get('only_blank') == 'on':
-            response.set_cookie('Only_blank', 'True')
-        else:
-            response.set_cookie('Only_blank', 'False')
+        Dashboard.start_refresh(fresh=request.POST.get('fresh') == 'on')
+        return redirect('dashboard')
 
-        if request.POST.get('tc911') == 'on':
-            response.set_cookie('tc911', 'True')
-        else:
-            response.set_cookie('tc911', 'False')
+    context = {'dashboard': get_dashboard_json(), 'result_columns': DASHBOARD_RESULTS}
+    return render(request, 'core/dashboard.html', context)
+
+def dashboard_status(request):
+    return JsonResponse(get_dashboard_json())
+
+def get_dashboard_json() -> dict:
+    return {
+        'progress': Dashboard.get_progress(),
+        'devices': list(DeviceSummary.objects.values('device_model', 'binary_version', 'total_tc',
+                                                     'summary', 'error', 'computed_at')),
+    }
 
-        if request.POST.get('Priority') != 'None':
-            response.set_cookie('Priority', request.POST.get('Priority'))
+def metrics(request):
+    """Returns stage timings, sizes and memory of STAR downloads in Prometheus text format"""
 
-        if request.POST.get('Variant') != 'None':
-            response.set_cookie('Variant', request.POST.get('Variant'))
+    cache_stats = ProjectCache.get_stats()
+    lines = [Metrics.render().rstrip('\n'),
+             '# TYPE starlight_project_cache_total counter']
+    for name in ('hits', 'misses', 'revalidations'):
+        lines.append(f'starlight_project_cache_total{{result="{name}"}} {cache_stats[name]}')
+    lines.append('# TYPE starlight_project_cache_size_bytes gauge')
+    lines.append(f'starlight_project_cache_size_bytes {cache_stats["size"]}')
+    lines.append('# TYPE starlight_prefetch_queue_depth gauge')
+    lines.append(f'starlight_prefetch_queue_depth {prefetch_scheduler.get_status()["queue_depth"]}')
+    return HttpResponse('\n'.join(lines) + '\n', content_type='text/plain; version=0.0.4')
 
-    return response
\ No newline at end of file
+def prefetch_status(request):
+    return JsonResponse(prefetch_scheduler.get_status())
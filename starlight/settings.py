@@ -36,6 +36,35 @@ with open(env_file) as file:
 
 REMOTE_DATABASE = ENV['REMOTE_DATABASE']
 
+# Connections to STAR: pool size, timeouts in seconds and retries of connection errors and
+# 502/503/504; a read timeout is not retried, so a stalled STAR call fails after READ_TIMEOUT
+STAR_HTTP = {
+    'POOL_SIZE': 16,
+    'CONNECT_TIMEOUT': 5,
+    'READ_TIMEOUT': 120,
+    'RETRIES': 3,
+    'BACKOFF_FACTOR': 0.5,
+}
+
+# Parse device projects while they are downloading instead of buffering the whole response
+STAR_STREAMING_PARSE = True
+
+# Serve the index and device pages with async views, for ASGI servers (see starlight/asgi.py)
+STAR_ASYNC_VIEWS = False
+
+# Changed test cases are pushed to open device pages by server-sent events instead of
+# reloading the page by timer, only for ASGI servers (see starlight/asgi.py); how often
+# to keep the connection alive (s) and how many changed rows are sent before the table
+# is reloaded instead
+STAR_LIVE_UPDATES = {
+    'ENABLED': False,
+    'HEARTBEAT': 30,
+    'MAX_ROWS': 500,
+}
+
+# Test cases of every cached project are indexed for the search across devices
+STAR_SEARCH_INDEX = True
+
 # Application definition
 
 INSTALLED_APPS = [
@@ -125,6 +154,97 @@ USE_I18N = True
 USE_TZ = True
 
 
+# Cache
+# https://docs.djangoproject.com/en/5.0/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'star-light',
+    },
+    # Rendered responses don't push other cached data out of the default cache
+    'rendered': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'star-light-rendered',
+        'OPTIONS': {'MAX_ENTRIES': 2000},
+    },
+}
+
+# Rendered windows of test cases and fragments of device pages, per version of the project
+STAR_RENDER_CACHE = {
+    'CACHE_ALIAS': 'rendered',
+    'TIMEOUT': 10 * 60,
+}
+
+# Parsed device projects, kept in process memory: TTL in seconds (per model if needed), for
+# how long an expired project is kept to be revalidated by its update time, total size in
+# bytes and TTL of the list of projects used for revalidation
+STAR_PROJECT_CACHE = {
+    'TTL': 300,
+    'TTL_PER_MODEL': {},
+    'KEEP_FOR': 24 * 60 * 60,
+    'MAX_SIZE': 512 * 1024 * 1024,
+    'LISTING_TTL': 60,
+    # The list of projects older than LISTING_TTL is still shown for this long while it's reloaded
+    'LISTING_STALE_FOR': 600,
+}
+
+# Memory budget of loading a project: responses bigger than SPOOL_OVER bytes are written
+# to a temporary file and parsed by a streaming pass, and long texts of parsed projects
+# bigger than SPILL_OVER bytes are moved to SQLite files in SPILL_DIR (system temp if None)
+STAR_MEMORY_BUDGET = {
+    'SPOOL_OVER': 32 * 1024 * 1024,
+    'SPILL_OVER': 64 * 1024 * 1024,
+    'SPILL_DIR': None,
+}
+
+# Raw STAR responses archived gzip-compressed in DIR by their SHA-1: whether to archive them,
+# how many responses to keep per device and for how many days (forever if None), gzip level
+# and whether projects are replayed from the latest archived response instead of STAR
+STAR_RAW_ARCHIVE = {
+    'ENABLED': False,
+    'DIR': BASE_DIR / 'archive',
+    'KEEP_PER_DEVICE': 20,
+    'KEEP_FOR_DAYS': 30,
+    'COMPRESS_LEVEL': 1,
+    'REPLAY': False,
+}
+
+# Loading several devices at once: threads downloading projects and processes parsing them
+STAR_LOAD_MANY = {
+    'DOWNLOAD_WORKERS': 8,
+    'PARSE_WORKERS': None,
+}
+
+# Parsed projects stored in the database: whether to store them, whether to show the
+# stored project while a fresh one is fetched, how many snapshots to keep per device,
+# rows per INSERT and threads writing them
+STAR_SNAPSHOT_STORE = {
+    'ENABLED': True,
+    'SERVE_STORED': True,
+    'KEEP_SNAPSHOTS': 50,
+    'BATCH_SIZE': 1000,
+    'WORKERS': 2,
+}
+
+# Background refresh of recently viewed devices: how often to check (s), for how long
+# after the last view to keep a device warm (s), at which part of TTL to refresh it,
+# random jitter as part of TTL and how many devices to refresh at once
+STAR_PREFETCH = {
+    'ENABLED': True,
+    'INTERVAL': 10,
+    'KEEP_WARM_FOR': 30 * 60,
+    'REFRESH_BEFORE': 0.8,
+    'JITTER': 0.1,
+    'MAX_WORKERS': 2,
+}
+
+# Devices updated in STAR within this many days are shown on the dashboard, all devices if None
+STAR_DASHBOARD = {
+    'ACTIVE_FOR_DAYS': 30,
+}
+
+
 # Static files (CSS, JavaScript, Images)
 # https://docs.djangoproject.com/en/5.0/howto/static-files/
 
@@ -1,4 +1,5 @@
 import os
+import multiprocessing
 from django.core.management import execute_from_command_line
 import webbrowser
 import os
@@ -31,4 +32,6 @@ def run_server():
 
 
 if __name__ == "__main__":
+    # Projects are parsed in worker processes, which must not start the server again in the frozen app
+    multiprocessing.freeze_support()
     run_server() 
\ No newline at end of file